@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.fu_metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'utils.middleware.ApiLoggingMiddleware',
+    'utils.query_inspector.QueryInspectorMiddleware',
 
 ]
 
@@ -300,6 +302,92 @@ WHITE_LIST = ['/api/system/userinfo', '/api/system/permCode', '/api/system/menu/
 API_LOG_ENABLE = True
 API_LOG_METHODS = ['POST', 'GET', 'DELETE', 'PUT']
 API_MODEL_MAP = {}
+# 日志由后台线程批量写入，False 时在请求中同步写入
+API_LOG_ASYNC = True
+# 日志队列长度，队列满时丢弃新日志
+API_LOG_QUEUE_SIZE = 10000
+# 每批写入条数
+API_LOG_BATCH_SIZE = 200
+# 最长等待多久(秒)写入一批
+API_LOG_FLUSH_INTERVAL = 1
+# 默认采样率 0~1，未被采样的请求只有出错时才记录
+API_LOG_SAMPLE_RATE = 1
+# 请求参数、返回信息最多记录的字符数
+API_LOG_MAX_BODY_SIZE = 2000
+# 按路径、请求方法配置的日志规则，按顺序匹配，第一条匹配的生效
+# path: 路径前缀 regex: 路径正则 methods: 请求方法 exclude: 不记录 sample_rate: 采样率 max_body_size: 记录字符数
+API_LOG_RULES = [
+    {'path': '/api/system/monitor', 'exclude': True},
+    {'path': '/metrics', 'exclude': True},
+    {'path': '/api/system/menu/route/tree', 'exclude': True},
+    {'path': '/api/system/permCode', 'methods': ['GET'], 'sample_rate': 0},
+]
+
+# 登录日志默认由进程内的后台线程批量写入；True 时交给 celery 的 save_login_logs 任务写入，
+# 必须运行 celery worker(celery -A fuadmin worker)，否则登录日志会一直积压在队列中
+LOGIN_LOG_ASYNC = False
+# 离线IP地址库(csv)路径，用于登录日志的地区信息，不配置则不解析
+IP_LOCATION_DB = None
+# 离线IP库未命中时，是否在后台通过在线接口补充地区信息(内网环境请关闭)
+IP_ANALYSIS_HTTP = False
+# 在线接口超时时间(秒)
+IP_ANALYSIS_HTTP_TIMEOUT = 3
+
+# 接口响应的 JSON 序列化实现: auto(安装了 orjson 时使用 orjson)、orjson、json
+JSON_RENDERER = 'auto'
+
+# 服务器监控后台采样间隔(秒)，/monitor 返回的最近数据点数；每个 web 进程在第一次请求 /monitor 时启动自己的采样线程
+MONITOR_SAMPLE_INTERVAL = 5
+MONITOR_HISTORY_SIZE = 120
+# 超过该秒数没有请求监控接口时采样线程退出，下次请求时重新启动
+MONITOR_IDLE_TIMEOUT = 300
+# 监控历史数据的精度层级: (精度秒数, 保留的桶数)，默认1小时5秒级、24小时分钟级、30天小时级
+MONITOR_TIERS = ((5, 720), (60, 1440), (3600, 720))
+
+# 接口指标(/metrics)，包含所有接口的访问量和耗时，默认只允许本机(METRICS_ALLOWED_IPS)访问；
+# 配置 METRICS_TOKEN 后其他地址的 Prometheus 可以带 Authorization: Bearer <token> 访问。
+# 反向代理转发的请求 REMOTE_ADDR 为代理地址，不要把代理地址加入 METRICS_ALLOWED_IPS，应使用 token
+METRICS_ENABLE = True
+METRICS_TOKEN = None
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+# gunicorn 等多进程部署时各进程写入指标文件的共享目录，以及写入间隔(秒)
+METRICS_MULTIPROC_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+
+# 开发、CI 环境检查每个请求的查询: 同一查询重复 QUERY_N_PLUS_ONE_THRESHOLD 次视为 N+1，
+# QUERY_BUDGETS 为路由模板(可用通配符)对应的查询次数上限，QUERY_INSPECTOR_RAISE 为 True 时超出上限抛出异常
+QUERY_INSPECTOR_ENABLE = False
+QUERY_INSPECTOR_RAISE = False
+QUERY_N_PLUS_ONE_THRESHOLD = 5
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGETS = {}
+
+# 分页总数缓存时间(秒)，相同模型、相同查询条件在此期间内不重复 count
+COUNT_CACHE_TIMEOUT = 10
+# 无过滤条件时估算行数超过该值直接使用估算值(postgresql/mysql)，None 表示总是精确统计
+COUNT_ESTIMATE_THRESHOLD = 100000
+
+# 导出数据时每次从数据库读取的行数
+EXPORT_CHUNK_SIZE = 2000
+# xlsx 需要生成完整个文件才能开始下载，超过该行数时导出接口自动转为后台导出
+EXPORT_XLSX_STREAM_MAX_ROWS = 10000
+# 后台导出任务去重的有效期(秒)，相同参数的任务在此期间未完成时不重复提交
+EXPORT_JOB_DEDUPE_TIMEOUT = 3600
+# 后台导出任务提交后超过该秒数仍为 PENDING(未开始执行)时，认为消息已丢失，相同的导出可以重新提交
+EXPORT_JOB_PENDING_TIMEOUT = 600
+# 后台导出文件的存放目录，不能放在静态文件目录下，只能通过 /system/file/{file_id}/download 由导出人下载
+EXPORT_ROOT = os.path.join(BASE_DIR, 'private', 'export')
+# 记录后台任务提交人的有效期(秒)，过期后只有超级管理员可以查询该任务
+TASK_OWNER_TIMEOUT = 86400
+# 导入数据时每批校验、写入的行数
+IMPORT_BATCH_SIZE = 1000
+# 导入失败时最多返回的错误行数
+IMPORT_MAX_ERRORS = 100
 
 # 初始化需要执行的列表，用来初始化后执行
 INITIALIZE_RESET_LIST = []
+
+# 进程内缓存检查共享版本号的间隔(秒)，数据变更后其他进程最迟在该间隔后失效
+LOCAL_CACHE_CHECK_INTERVAL = 1
+# 进程内缓存每条数据的最长保留时间(秒)，缓存服务故障导致失效通知丢失时，旧数据最迟在该时间后丢弃
+LOCAL_CACHE_MAX_AGE = 300
@@ -17,8 +17,11 @@ from ninja import ModelSchema, Query, Router, Schema
 from ninja.files import UploadedFile
 from ninja.pagination import paginate
 from system.models import File
-from utils.fu_crud import create, delete, retrieve, update
+from utils.fu_auth import OwnerAuth
+from utils.fu_crud import create, delete, get_private_file_path, retrieve, update
 from utils.fu_ninja import FuFilters, MyPagination
+from utils.fu_response import FuResponse
+from utils.usual import get_user_info_from_token
 
 router = Router()
 
@@ -47,19 +50,19 @@ def delete_file(request, file_id: int):
 @router.get("/file", response=List[SchemaOut])
 @paginate(MyPagination)
 def list_file(request, filters: Filters = Query(...)):
-    qs = retrieve(request, File, filters)
+    qs = retrieve(request, File, filters).filter(private=False)
     return qs
 
 
 @router.get("/file/{file_id}", response=SchemaOut)
 def get_file(request, file_id: int):
-    qs = get_object_or_404(File, id=file_id)
+    qs = get_object_or_404(File, id=file_id, private=False)
     return qs
 
 
 @router.get("/file/all/list", response=List[SchemaOut])
 def all_list_role(request):
-    qs = retrieve(request, File)
+    qs = retrieve(request, File).filter(private=False)
     return qs
 
 
@@ -88,12 +91,34 @@ def upload(request, file: UploadedFile = NinjaFile(...)):
 @router.post("/download")
 def create_post(request, data: SchemaIn):
     filePath = str(BASE_DIR) + unquote(data.url)
+    # 私有文件只能通过 /file/{file_id}/download 下载
+    if os.path.realpath(filePath).startswith(os.path.realpath(get_private_file_path(''))):
+        return FuResponse(code=403, msg='无权下载该文件', status=403)
     r = FileResponse(open(filePath, "rb"), as_attachment=True)
     return r
 
 
+@router.get("/file/{file_id}/download", auth=OwnerAuth())
+def download_file(request, file_id: int):
+    """下载文件，后台导出任务生成的文件只允许导出人下载"""
+    user_info = get_user_info_from_token(request)
+    qs = get_object_or_404(File, id=file_id)
+    if not user_info['is_superuser'] and qs.creator_id != user_info['id']:
+        return FuResponse(code=403, msg='无权下载该文件', status=403)
+    if qs.private:
+        file_path = get_private_file_path(str(qs.url))
+    else:
+        file_path = os.path.join(str(BASE_DIR), str(qs.url))
+    if not os.path.isfile(file_path):
+        return FuResponse(code=404, msg='文件不存在', status=404)
+    return FileResponse(open(file_path, "rb"), as_attachment=True, filename=qs.name)
+
+
 @router.get("/image/{image_id}", auth=None)
 def get_file(request, image_id: int):
-    qs = get_object_or_404(File, id=image_id)
+    # 不需要登录，私有文件(后台导出的文件)不能通过该接口访问
+    qs = File.objects.filter(id=image_id, private=False).first()
+    if qs is None:
+        return FuResponse(code=404, msg='文件不存在', status=404)
 
     return HttpResponse(open(os.path.join(str(BASE_DIR), str(qs.url)), "rb"), content_type='image/png')
@@ -10,7 +10,7 @@ from ninja import Field, ModelSchema, Query, Router, Schema
 from ninja.pagination import paginate
 from system.models import LoginLog
 from utils.fu_crud import create, delete, retrieve, update
-from utils.fu_ninja import FuFilters, MyPagination
+from utils.fu_ninja import CursorPagination, FuFilters, MyPagination
 
 router = Router()
 
@@ -40,6 +40,14 @@ def list_login_log(request, filters: Filters = Query(...)):
     return qs
 
 
+# 游标分页，数据量大时代替按页码分页
+@router.get("/login_log/cursor/list", response=List[SchemaOut])
+@paginate(CursorPagination)
+def cursor_list_login_log(request, filters: Filters = Query(...)):
+    qs = retrieve(request, LoginLog, filters)
+    return qs
+
+
 @router.get("/login_log/all/list", response=List[SchemaOut])
 def all_list_role(request):
     qs = retrieve(request, LoginLog)
@@ -9,12 +9,15 @@ from datetime import datetime
 
 from django.contrib import auth
 from django.forms import model_to_dict
+from django.http import HttpResponseNotModified
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags, quote_etag
 from ninja import Router, ModelSchema, Query, Schema, Field
 
 from fuadmin.settings import SECRET_KEY, TOKEN_LIFETIME
-from system.models import Users, Role, MenuButton, MenuColumnField
+from system.models import Users
 from utils.fu_jwt import FuJwt
+from utils.fu_permission import get_perm_codes, get_user_role_ids
 from utils.fu_response import FuResponse
 from utils.request_util import save_login_log
 from utils.usual import get_user_info_from_token
@@ -100,22 +103,14 @@ def get_userinfo(request):
 def route_menu_tree(request):
     """用于前端获取当前用户的按钮权限"""
     token_user = get_user_info_from_token(request)
-    user = Users.objects.get(id=token_user['id'])
-
-    if not token_user['is_superuser']:
-        menu_button_ids = user.role.values_list('permission__id', flat=True)
-        menu_column_ids = user.role.values_list('column__id', flat=True)
-
-        # queryset = MenuButton.objects.filter(id__in=menuIds, status=1).values()
-        queryset_button = MenuButton.objects.filter(id__in=menu_button_ids)
-        queryset_column = MenuColumnField.objects.filter(
-            id__in=menu_column_ids)
+    role_ids = None if token_user['is_superuser'] else get_user_role_ids(token_user['id'])
+    perm_codes = get_perm_codes(role_ids)
+    etag = quote_etag(perm_codes.etag)
+    # 权限未变化时直接返回304
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
     else:
-        queryset_button = MenuButton.objects.all()
-        queryset_column = MenuColumnField.objects.all()
-
-    queryset = [*queryset_button, *queryset_column]
-    code_list = []
-    for item in queryset:
-        code_list.append(item.code)
-    return FuResponse(data=code_list)
+        response = FuResponse(data=sorted(perm_codes.codes))
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
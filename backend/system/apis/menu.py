@@ -8,15 +8,16 @@
 from typing import List
 
 from django.shortcuts import get_object_or_404
-from fuadmin.settings import SECRET_KEY
 from ninja import Field, ModelSchema, Query, Router, Schema
 from ninja.pagination import paginate
-from system.models import Menu, MenuButton, Users
+from system.models import Menu, MenuButton, Role
+from utils.fu_cache import route_tree_cache
 from utils.fu_crud import create, delete, retrieve, update
-from utils.fu_jwt import FuJwt
 from utils.fu_ninja import FuFilters, MyPagination
-from utils.fu_response import FuResponse
+from utils.fu_permission import get_user_role_ids
+from utils.fu_response import FuResponse, render_content
 from utils.list_to_tree import list_to_route, list_to_tree
+from utils.usual import get_user_info_from_token
 
 router = Router()
 
@@ -78,14 +79,23 @@ def get_menu(request, menu_id: int):
 @router.get("/menu/route/tree")
 def route_menu_tree(request):
     """用于前端获取当前角色的路由"""
-    token = request.META.get("HTTP_AUTHORIZATION")
-    token = token.split(" ")[1]
-    token_user = FuJwt(SECRET_KEY).decode(SECRET_KEY, token).payload
-    user = Users.objects.get(id=token_user['id'])
-    queryset = Menu.objects.filter(status=1).values()
-    if not token_user['is_superuser']:
-        menuIds = user.role.values_list('menu__id', flat=True)
-        queryset = Menu.objects.filter(id__in=menuIds, status=1).values()
-    menu_tree = list_to_route(list(queryset))
-    return FuResponse(data=menu_tree)
+    token_user = get_user_info_from_token(request)
+    if token_user['is_superuser']:
+        role_ids = None
+        cache_key = 'superuser'
+    else:
+        role_ids = get_user_role_ids(token_user['id'])
+        cache_key = ','.join(map(str, role_ids))
+
+    def build():
+        queryset = Menu.objects.filter(status=1)
+        if role_ids is not None:
+            menu_ids = Role.menu.through.objects.filter(role_id__in=role_ids).values('menu_id')
+            queryset = queryset.filter(id__in=menu_ids)
+        menu_tree = list_to_route(list(queryset.values()))
+        return render_content(data=menu_tree)
+
+    # 相同角色组合的用户共用同一份序列化好的路由
+    content = route_tree_cache.get_or_set(cache_key, build)
+    return FuResponse(content=content)
 
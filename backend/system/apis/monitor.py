@@ -7,12 +7,34 @@
 from ninja import Router
 
 from utils.fu_response import FuResponse
-from utils.system import system
+from utils.monitor_sampler import get_sampler
 
 router = Router()
 
 
 @router.get("/monitor")
-def list_role(request):
-    qs = system().GetSystemAllInfo()
+def list_role(request, since: int = None):
+    """
+    返回后台采样线程最新一次的监控数据，history 为最近的数据点，用于绘制趋势图
+    since: 只返回该时间戳之后的数据点，轮询时传入上次最后一个点的 time
+    """
+    sampler = get_sampler()
+    snapshot = sampler.snapshot()
+    if snapshot is None:
+        snapshot = sampler.sample()
+    qs = dict(snapshot)
+    qs['history'] = sampler.get_history(since)
+    return FuResponse(data=qs)
+
+
+@router.get("/monitor/history")
+def monitor_history(request, resolution: int = 60, since: int = None, metrics: str = None):
+    """
+    监控历史数据，按精度返回每个时间桶的平均值和最大值
+    resolution: 精度(秒)，取不超过该值的最粗一层，默认分钟级
+    since: 只返回该时间戳之后的时间桶
+    metrics: 逗号分隔的指标名(cpu,mem,load,up,down,disk_read,disk_write)，不传返回全部
+    """
+    metric_list = [item.strip() for item in metrics.split(',') if item.strip()] if metrics else None
+    qs = get_sampler().query(resolution, since, metric_list)
     return FuResponse(data=qs)
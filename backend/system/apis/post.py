@@ -67,7 +67,7 @@ def update_post(request, post_id: int, data: PostSchemaIn):
 @router.get("/post", response=List[PostSchemaOut])
 @paginate(MyPagination)
 def list_post(request, filters: Filters = Query(...)):
-    qs = retrieve(request, Post, filters)
+    qs = retrieve(request, Post, filters, schema=PostSchemaOut)
     return qs
 
 
@@ -79,7 +79,7 @@ def get_post(request, post_id: int):
 
 @router.get("/post/all/list", response=List[PostSchemaOut])
 def all_list_post(request):
-    qs = retrieve(request, Post)
+    qs = retrieve(request, Post, schema=PostSchemaOut)
     return qs
 
 
@@ -11,7 +11,7 @@ from typing import List
 from django.shortcuts import get_object_or_404
 from ninja import Field, ModelSchema, Query, Router, Schema
 from ninja.pagination import paginate
-from system.models import Menu, Role, MenuButton
+from system.models import Menu, MenuButton, MenuColumnField, Role
 from utils.fu_crud import create, delete, retrieve
 from utils.fu_ninja import FuFilters, MyPagination
 from utils.fu_response import FuResponse
@@ -83,13 +83,13 @@ def update_role(request, role_id: int, payload: SchemaIn):
 @router.get("/role", response=List[SchemaOut])
 @paginate(MyPagination)
 def list_role(request, filters: Filters = Query(...)):
-    qs = retrieve(request, Role, filters)
+    qs = retrieve(request, Role, filters, schema=SchemaOut)
     return qs
 
 
 @router.get("/role/all/list", response=List[SchemaOut])
 def all_list_role(request):
-    qs = retrieve(request, Role)
+    qs = retrieve(request, Role, schema=SchemaOut)
     return qs
 
 
@@ -107,11 +107,12 @@ class ButtonColumnFilters(FuFilters):
 def list_menu_button_tree(request, filters: ButtonColumnFilters = Query(...)):
     qs = Menu.objects.filter()
     result = []
-    menu_button_list = []
+    # 一次查出所有菜单的按钮，避免每个菜单单独查询
+    menu_buttons = group_by_menu(MenuButton.objects.values())
 
     for item in qs:
         dict_item = item.__dict__
-        menu_button = list(item.menuPermission.all().values())
+        menu_button = menu_buttons.get(item.id, [])
 
         for button_item in menu_button:
             button_item['id'] = f"b{button_item['id']}"
@@ -129,9 +130,10 @@ def list_menu_button_tree(request, filters: ButtonColumnFilters = Query(...)):
 def list_menu_button_tree(request, filters: ButtonColumnFilters = Query(...)):
     qs = Menu.objects.all()
     result = []
+    column_fields = group_by_menu(MenuColumnField.objects.values())
     for item in qs:
         dict_item = item.__dict__
-        column_field = list(item.menuColumnField.all().values())
+        column_field = column_fields.get(item.id, [])
         for column_field_item in column_field:
             column_field_item['id'] = f"c{column_field_item['id']}"
             column_field_item['parent_id'] = column_field_item.pop('menu_id')
@@ -172,6 +174,14 @@ def list_menu_tree(request, filters: Filters = Query(...)):
 #     return qs
 
 
+def group_by_menu(rows):
+    """按 menu_id 分组"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(row['menu_id'], []).append(row)
+    return groups
+
+
 def get_button_or_column_menu(data, flag):
     return_data = []
     for i in data:
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# @FileName: task.py
+# @Software: PyCharm
+from ninja import Router
+
+from fuadmin.celery import app
+from utils.fu_auth import OwnerAuth
+from utils.fu_crud import get_task_owner
+from utils.fu_response import FuResponse
+from utils.usual import get_user_info_from_token
+
+router = Router()
+
+
+@router.get("/task/{task_id}", auth=OwnerAuth())
+def get_task(request, task_id: str):
+    """查询后台任务(导入、导出等)的状态和进度，只有任务提交人和超级管理员可以查看"""
+    user_info = get_user_info_from_token(request)
+    if not user_info['is_superuser'] and get_task_owner(task_id) != user_info['id']:
+        return FuResponse(code=404, msg='任务不存在', status=404)
+    result = app.AsyncResult(task_id)
+    data = {
+        'task_id': task_id,
+        'state': result.state,
+        'progress': None,
+        'result': None,
+    }
+    if result.state == 'PROGRESS':
+        data['progress'] = result.info
+    elif result.successful():
+        data['result'] = result.result
+    elif result.failed():
+        data['result'] = str(result.result)
+    return FuResponse(data=data)
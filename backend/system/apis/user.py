@@ -82,13 +82,13 @@ def update_user(request, user_id: int, payload: SchemaIn):
 @router.get("/user", response=List[SchemaOut])
 @paginate(MyPagination)
 def list_user(request, filters: Filters = Query(...)):
-    qs = retrieve(request, Users, filters)
+    qs = retrieve(request, Users, filters, schema=SchemaOut)
     return qs
 
 
 @router.get("/user/all/list", response=List[SchemaOut])
 def all_list_user(request):
-    qs = retrieve(request, Users)
+    qs = retrieve(request, Users, schema=SchemaOut)
     return qs
 
 
@@ -80,7 +80,8 @@ def update_{api_info.code}(request, id: int, data: {RuleConvert.to_upper_camel_c
 @router.get('/{api_info.code}', response=List[{RuleConvert.to_upper_camel_case(api_info.code)}SchemaOut])
 @paginate(MyPagination)
 def list_{api_info.code}(request, filters: Filters = Query(...)):
-    qs = retrieve(request, {RuleConvert.to_upper_camel_case(api_info.code)}, filters)
+    qs = retrieve(request, {RuleConvert.to_upper_camel_case(api_info.code)}, filters,
+                  schema={RuleConvert.to_upper_camel_case(api_info.code)}SchemaOut)
     return qs
 
 
@@ -163,7 +163,7 @@ def generator_index(index_info):
 
       async function handleExportData() {{
         const response = await exportData();
-        await downloadByData(response.data, '{index_info.name}.xlsx');
+        await downloadByData(response.data, '{index_info.name}.csv');
       }}
 
       function handleSuccess() {{
@@ -0,0 +1,152 @@
+import datetime
+import json
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from user_agents import parse
+
+from ninja.responses import NinjaJSONEncoder
+
+from utils.fu_jwt import DateEncoder
+from utils.fu_renderer import JSON_BACKENDS, fu_default, ninja_default
+from utils.list_to_tree import list_to_route, list_to_tree
+from utils.request_util import get_browser, get_os, get_user_agent
+
+
+def make_tree_data(size):
+    """生成随机树形数据，每个节点的父节点都在它之前"""
+    data = [{"id": 1, "parent_id": None}]
+    for i in range(2, size + 1):
+        data.append({"id": i, "parent_id": random.randint(1, i - 1)})
+    random.shuffle(data)
+    return data
+
+
+def bench_tree(stdout):
+    stdout.write("list_to_tree:")
+    for size in (1000, 10000, 100000):
+        data = make_tree_data(size)
+        start = time.perf_counter()
+        list_to_tree(data)
+        cost = time.perf_counter() - start
+        stdout.write(f"  {size:>7} 节点  {cost * 1000:9.2f} ms  {cost / size * 1e6:6.2f} us/节点")
+
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:120.0) Gecko/20100101 Firefox/120.0',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148',
+]
+
+
+def bench_user_agent(stdout, rounds=2000):
+    factory = RequestFactory()
+    requests = [factory.get('/', HTTP_USER_AGENT=USER_AGENTS[i % len(USER_AGENTS)]) for i in range(rounds)]
+
+    start = time.perf_counter()
+    for request in requests:
+        # 原实现: get_browser、get_os、save_login_log 各解析一次
+        ua_string = request.META['HTTP_USER_AGENT']
+        parse(ua_string).get_browser()
+        parse(ua_string).get_os()
+        str(parse(ua_string))
+    uncached = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for request in requests:
+        get_browser(request)
+        get_os(request)
+        str(get_user_agent(request))
+    cached = time.perf_counter() - start
+
+    stdout.write("user agent 解析:")
+    stdout.write(f"  每次解析  {uncached / rounds * 1e6:9.2f} us/请求")
+    stdout.write(f"  缓存解析  {cached / rounds * 1e6:9.2f} us/请求")
+
+
+def make_menu_data(size):
+    """生成随机菜单数据，字段与菜单表相近"""
+    now = datetime.datetime.now()
+    data = []
+    for item in make_tree_data(size):
+        i = item["id"]
+        data.append({
+            "id": i, "parent_id": item["parent_id"], "icon": "ant-design:menu-outlined", "title": f"菜单{i}",
+            "permission": f"menu:{i}", "is_ext": False, "type": 1, "path": f"/menu/{i}", "redirect": None,
+            "component": f"/system/menu/{i}/index", "name": f"Menu{i}", "status": True, "keepalive": False,
+            "hide_menu": False, "sort": i, "remark": None, "creator_id": 1, "modifier": "admin",
+            "belong_dept": 1, "create_datetime": now, "update_datetime": now,
+        })
+    return data
+
+
+def make_list_data(size):
+    """生成带 datetime/Decimal/UUID 字段的列表数据"""
+    now = datetime.datetime.now()
+    return [{
+        "id": i, "uuid": uuid.uuid4(), "name": f"名称{i}", "code": f"code_{i}", "amount": Decimal(f"{i}.25"),
+        "status": i % 2 == 0, "sort": i, "remark": "描述" * 10, "creator_id": 1, "modifier": "admin",
+        "belong_dept": 1, "create_datetime": now, "update_datetime": now,
+    } for i in range(size)]
+
+
+def bench_render(stdout, rounds=50):
+    payloads = [
+        ("菜单树 500 节点", {"code": 2000, "result": list_to_route(make_menu_data(500)), "message": "success"}),
+        ("列表 1000 行", {"code": 2000, "result": {"items": make_list_data(1000), "total": 1000},
+                        "message": "success"}),
+    ]
+    # 原实现: FuResponse 使用 DateEncoder(不支持 Decimal/UUID，这里补上以便对比)，FuNinjaAPI 使用 NinjaJSONEncoder
+    class OldFuEncoder(DateEncoder):
+        def default(self, obj):
+            if isinstance(obj, datetime.datetime):
+                return super().default(obj)
+            return NinjaJSONEncoder().default(obj)
+
+    renderers = [
+        ("FuResponse json", lambda data: json.dumps(data, cls=OldFuEncoder)),
+        ("FuNinjaAPI json", lambda data: json.dumps(data, cls=NinjaJSONEncoder)),
+    ]
+    for name, dumps in JSON_BACKENDS.items():
+        if name != 'json':
+            renderers.append((f"FuResponse {name}", lambda data, dumps=dumps: dumps(data, fu_default)))
+            renderers.append((f"FuNinjaAPI {name}", lambda data, dumps=dumps: dumps(data, ninja_default)))
+
+    stdout.write("JSON 序列化:")
+    for title, payload in payloads:
+        stdout.write(f"  {title}:")
+        for name, dumps in renderers:
+            start = time.perf_counter()
+            for _ in range(rounds):
+                dumps(payload)
+            cost = (time.perf_counter() - start) / rounds
+            stdout.write(f"    {name:<20} {cost * 1000:9.3f} ms")
+
+
+BENCHMARKS = {
+    'tree': bench_tree,
+    'ua': bench_user_agent,
+    'render': bench_render,
+}
+
+
+class Command(BaseCommand):
+    """
+    性能基准测试命令: python manage.py benchmark [tree ua render ...]
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', type=str, help=f"可选: {', '.join(BENCHMARKS)}，不传则全部执行")
+
+    def handle(self, *args, **options):
+        names = options['names'] or list(BENCHMARKS)
+        for name in names:
+            if name not in BENCHMARKS:
+                raise CommandError(f"未知的基准测试: {name}")
+        for name in names:
+            BENCHMARKS[name](self.stdout)
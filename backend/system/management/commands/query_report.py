@@ -0,0 +1,87 @@
+import re
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.forms.models import model_to_dict
+from django.test import Client
+from django.urls import URLPattern, URLResolver, get_resolver
+from fuadmin.settings import SECRET_KEY
+
+from system.models import Users
+from utils.fu_jwt import FuJwt
+from utils.query_inspector import QueryCapture, check_queries
+
+PATH_PARAM_RE = re.compile(r'<(?:\w+:)?\w+>')
+
+
+def iter_api_routes(patterns=None, prefix=''):
+    """遍历所有 ninja 接口的 (路由模板, 请求方法)"""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_api_routes(pattern.url_patterns, prefix + str(pattern.pattern))
+        elif isinstance(pattern, URLPattern):
+            path_view = getattr(pattern.callback, '__self__', None)
+            for operation in getattr(path_view, 'operations', []):
+                for method in operation.methods:
+                    yield prefix + str(pattern.pattern), method
+
+
+def make_token(user):
+    """与登录接口相同的 token"""
+    user_dict = model_to_dict(user)
+    user_dict['post'] = list(user.post.values_list('id', flat=True))
+    user_dict['role'] = list(user.role.values_list('id', flat=True))
+    user_dict.pop('password', None)
+    user_dict.pop('avatar', None)
+    jwt = FuJwt(SECRET_KEY, user_dict, valid_to=int(datetime.now().timestamp()) + 3600)
+    return f'bearer {jwt.encode()}'
+
+
+class Command(BaseCommand):
+    """
+    查询检查报告: python manage.py query_report [--username admin] [--include api/system/*] [--fail]
+    用测试客户端以指定用户请求所有 GET 接口(路径参数填 1)，输出每个接口的查询次数、上限和疑似 N+1 查询
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', type=str, default=None, help='请求使用的用户，默认第一个超级管理员')
+        parser.add_argument('--include', type=str, default=None, help='只检查匹配的路由(正则)')
+        parser.add_argument('--threshold', type=int, default=None, help='同一查询重复多少次视为 N+1')
+        parser.add_argument('--fail', action='store_true', help='有超出上限或 N+1 的接口时返回非零退出码')
+
+    def handle(self, *args, **options):
+        if options['username']:
+            user = Users.objects.filter(username=options['username']).first()
+        else:
+            user = Users.objects.filter(is_superuser=True).order_by('id').first()
+        if user is None:
+            raise CommandError('找不到用于请求接口的用户')
+        client = Client(HTTP_AUTHORIZATION=make_token(user), HTTP_USER_AGENT='query_report')
+        include = re.compile(options['include']) if options['include'] else None
+
+        problems = 0
+        for route, method in sorted(set(iter_api_routes())):
+            if method != 'GET' or (include and not include.search(route)):
+                continue
+            url = '/' + PATH_PARAM_RE.sub('1', route)
+            with QueryCapture() as capture:
+                try:
+                    response = client.get(url)
+                    status = response.status_code
+                except Exception as e:
+                    status = type(e).__name__
+            result = check_queries(method, route, capture)
+            n_plus_one = capture.repeated(options['threshold']) if options['threshold'] else result['n_plus_one']
+            flag = ''
+            if result['over_budget'] or n_plus_one:
+                problems += 1
+                flag = ' !'
+            budget = result['budget'] if result['budget'] is not None else '-'
+            self.stdout.write(f'{method:<6} {route:<60} {status!s:<5} 查询 {result["count"]:>4} / {budget}{flag}')
+            for shape, count in n_plus_one:
+                self.stdout.write(f'         N+1 x{count}: {shape[:160]}')
+        self.stdout.write(f'共 {problems} 个接口存在问题')
+        if options['fail'] and problems:
+            raise CommandError(f'{problems} 个接口超出查询上限或存在 N+1 查询')
@@ -263,6 +263,8 @@ class OperationLog(CoreModel):
         verbose_name = '操作日志'
         verbose_name_plural = verbose_name
         ordering = ('-create_datetime',)
+        # 游标分页(CursorPagination)使用的排序
+        indexes = [models.Index(fields=['-create_datetime', '-id'], name='operation_log_cursor_idx')]
 
 
 def media_file_name(instance, filename):
@@ -277,6 +279,8 @@ class File(CoreModel):
     url = models.FileField(upload_to=media_file_name)
     size = models.BigIntegerField(null=True, blank=True, verbose_name="大小", help_text="大小")
     md5sum = models.CharField(max_length=36, blank=True, verbose_name="文件md5", help_text="文件md5")
+    private = models.BooleanField(default=False, verbose_name="私有文件",
+                                  help_text="私有文件(如后台导出的文件)存放在 EXPORT_ROOT，只允许创建人下载，不在文件列表中显示")
 
     class Meta:
         db_table = 'system_file'
@@ -396,6 +400,8 @@ class LoginLog(CoreModel):
         verbose_name = '登录日志'
         verbose_name_plural = verbose_name
         ordering = ('-create_datetime',)
+        # 游标分页(CursorPagination)使用的排序
+        indexes = [models.Index(fields=['-create_datetime', '-id'], name='login_log_cursor_idx')]
 
 
 class GeneratorTemplate(CoreModel):
@@ -26,6 +26,7 @@ from system.apis.file import router as file_router
 from system.apis.monitor import router as monitor_router
 from system.apis.menu_column import router as menu_column_field_router
 from system.apis.code_generator import router as generator_template_router
+from system.apis.task import router as task_router
 
 system_router = Router()
 system_router.add_router('/', dept_router, tags=["Dept"])
@@ -49,3 +50,4 @@ system_router.add_router('/', file_router, tags=["File"])
 system_router.add_router('/', monitor_router, tags=["Monitor"])
 system_router.add_router('/', menu_column_field_router, tags=["MenuColumnField"])
 system_router.add_router('/', generator_template_router, tags=["GeneratorTemplate"])
+system_router.add_router('/', task_router, tags=["Task"])
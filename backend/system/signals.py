@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# @FileName: signals.py
+# @Software: PyCharm
+"""
+模型变更时失效进程内缓存
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from system.models import Dept, Menu, MenuButton, MenuColumnField, Role, Users
+from utils.fu_cache import route_tree_cache
+from utils.fu_crud import bulk_created
+from utils.fu_permission import (active_user_cache, data_scope_cache, perm_code_cache, permission_cache,
+                                 user_role_cache)
+from utils.usual import dept_cache
+
+
+def invalidate_on_commit(*caches):
+    """事务提交后再失效，避免其他进程在提交前用旧数据重建缓存"""
+    for item in caches:
+        transaction.on_commit(item.invalidate)
+
+
+@receiver(m2m_changed, sender=Users.role.through)
+def user_role_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_on_commit(user_role_cache)
+
+
+@receiver(post_save, sender=Users)
+def user_saved(sender, update_fields=None, **kwargs):
+    # 登录时只更新 last_login，不影响用户是否可用
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_on_commit(active_user_cache)
+
+
+@receiver(post_delete, sender=Users)
+def user_deleted(sender, **kwargs):
+    invalidate_on_commit(user_role_cache, active_user_cache)
+
+
+@receiver(m2m_changed, sender=Role.permission.through)
+def role_permission_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_on_commit(permission_cache, perm_code_cache)
+
+
+@receiver(m2m_changed, sender=Role.column.through)
+def role_column_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_on_commit(perm_code_cache)
+
+
+@receiver(m2m_changed, sender=Role.dept.through)
+def role_dept_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_on_commit(data_scope_cache)
+
+
+@receiver([post_save, bulk_created], sender=Role)
+def role_saved(sender, **kwargs):
+    invalidate_on_commit(data_scope_cache)
+
+
+@receiver(post_delete, sender=Role)
+def role_deleted(sender, **kwargs):
+    invalidate_on_commit(user_role_cache, permission_cache, data_scope_cache, perm_code_cache, route_tree_cache)
+
+
+@receiver(m2m_changed, sender=Role.menu.through)
+def role_menu_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_on_commit(route_tree_cache)
+
+
+@receiver([post_save, post_delete, bulk_created], sender=Menu)
+def menu_changed(sender, **kwargs):
+    invalidate_on_commit(route_tree_cache)
+
+
+@receiver([post_save, post_delete, bulk_created], sender=MenuButton)
+def menu_button_changed(sender, **kwargs):
+    invalidate_on_commit(permission_cache, perm_code_cache)
+
+
+@receiver([post_save, post_delete, bulk_created], sender=MenuColumnField)
+def menu_column_changed(sender, **kwargs):
+    invalidate_on_commit(perm_code_cache)
+
+
+@receiver([post_save, post_delete, bulk_created], sender=Dept)
+def dept_changed(sender, **kwargs):
+    invalidate_on_commit(dept_cache)
@@ -5,10 +5,49 @@
 # author: 臧成龙
 # QQ: 939589097
 from celery.app import task
+from django.apps import apps
+from django.utils.module_loading import import_string
 
 from fuadmin.celery import app
+from utils.fu_crud import release_export_job, run_export, run_import
+from utils.request_util import write_login_logs
 
 
 @app.task(name="system.tasks.test_task")
 def test_task():
-    print('test')
\ No newline at end of file
+    print('test')
+
+
+@app.task(name="system.tasks.save_login_logs")
+def save_login_logs(entries):
+    """批量补充并写入登录日志"""
+    write_login_logs(entries)
+
+
+@app.task(bind=True, name="system.tasks.import_data_task")
+def import_data_task(self, model_label, scheme_path, file_path, import_fields, user_info):
+    """后台导入Excel数据，通过任务状态 PROGRESS 上报进度"""
+    model = apps.get_model(model_label)
+    scheme = import_string(scheme_path)
+
+    def progress(done, total):
+        self.update_state(state='PROGRESS', meta={'done': done, 'total': total})
+
+    return run_import(user_info, model, scheme, file_path, import_fields, progress=progress)
+
+
+@app.task(bind=True, name="system.tasks.export_data_task")
+def export_data_task(self, model_label, scheme_path, export_fields, file_format, filters, user_info, dedupe_key=None):
+    """后台导出数据到文件，通过任务状态 PROGRESS 上报进度，完成后返回文件信息"""
+    model = apps.get_model(model_label)
+    scheme = import_string(scheme_path)
+
+    def progress(done, total):
+        self.update_state(state='PROGRESS', meta={'done': done, 'total': total})
+
+    try:
+        return run_export(user_info, model, scheme, export_fields, file_format, filters, progress=progress)
+    finally:
+        # 任务结束后允许再次提交相同的导出
+        if dedupe_key:
+            release_export_job(dedupe_key, self.request.id)
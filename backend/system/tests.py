@@ -1,4 +1,25 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+
+import openpyxl
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from system.apis.post import PostSchemaIn
+from system.models import Dept, File, LoginLog, Menu, MenuButton, Post, Role, Users
+from utils.fu_cache import LocalVersionCache
+from utils.fu_crud import run_import
+from utils.fu_jwt import FuJwt
+from utils.fu_ninja import CursorPagination
+from utils.fu_permission import (active_user_cache, data_scope_cache, get_data_scope, has_api_permission,
+                                 perm_code_cache, permission_cache, user_role_cache)
+from utils.list_to_tree import build_tree
+from utils.usual import dept_cache, get_dept
+from fuadmin.settings import BASE_DIR, SECRET_KEY
 
 # Create your tests here.
 def debug(func):
@@ -11,4 +32,299 @@ def debug(func):
 def hello():
     print("hello")
 
-hello()
\ No newline at end of file
+hello()
+
+def auth_client(client, user, is_superuser=False):
+    """给测试客户端加上指定用户的 token"""
+    payload = {'id': user.id, 'is_superuser': is_superuser, 'name': user.name, 'username': user.username,
+               'dept': user.dept_id}
+    token = FuJwt(SECRET_KEY, payload, valid_to=int(time.time()) + 600).encode()
+    client.defaults['HTTP_AUTHORIZATION'] = f'bearer {token}'
+    return client
+
+
+class FuTestCase(TestCase):
+
+    def setUp(self):
+        # 进程内缓存不随测试事务回滚，每个测试开始前清空，避免复用的id命中上一个测试的数据
+        for item in (active_user_cache, user_role_cache, permission_cache, data_scope_cache, perm_code_cache,
+                     dept_cache):
+            item.invalidate()
+        # 共享缓存(locmem)同样不会回滚
+        cache.clear()
+
+
+@override_settings(LOCAL_CACHE_CHECK_INTERVAL=0)
+class LocalVersionCacheTest(TestCase):
+
+    def test_invalidate_during_build_discards_value(self):
+        cache = LocalVersionCache('test_race')
+
+        def build():
+            # 生成期间其他线程修改了权限并失效缓存
+            cache.invalidate()
+            return 'old'
+
+        self.assertEqual(cache.get_or_set('key', build), 'old')
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.get_or_set('key', lambda: 'new'), 'new')
+
+    def test_lost_version_bump_is_retried(self):
+        cache = LocalVersionCache('test_bump')
+        other = LocalVersionCache('test_bump')
+        other.get_or_set('key', lambda: 'old')
+        with mock.patch('utils.fu_cache.bump_version', return_value=None):
+            cache.invalidate()
+        self.assertEqual(other.get('key'), 'old')
+        # 缓存服务恢复后，下一次检查时补上版本号
+        cache.get('key')
+        self.assertIsNone(other.get('key'))
+
+    @override_settings(LOCAL_CACHE_MAX_AGE=0)
+    def test_entries_expire_after_max_age(self):
+        cache = LocalVersionCache('test_max_age')
+        cache.set('key', 'value')
+        time.sleep(0.01)
+        self.assertIsNone(cache.get('key'))
+
+
+class PrivateFileTest(FuTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(EXPORT_ROOT=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.owner = Users.objects.create(username='owner', name='owner')
+        self.other = Users.objects.create(username='other', name='other')
+        os.makedirs(os.path.join(directory.name, '20220101'))
+        with open(os.path.join(directory.name, '20220101', 'export.csv'), 'wb') as f:
+            f.write(b'name\nexport\n')
+        self.file = File.objects.create(name='export.csv', save_name='export.csv', url='20220101/export.csv',
+                                        private=True, creator=self.owner)
+
+    def test_owner_can_download(self):
+        response = auth_client(self.client, self.owner).get(f'/api/system/file/{self.file.id}/download')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'name\nexport\n')
+
+    def test_other_user_gets_403(self):
+        response = auth_client(self.client, self.other).get(f'/api/system/file/{self.file.id}/download')
+        self.assertEqual(response.status_code, 403)
+
+    def test_anonymous_cannot_get_export_file(self):
+        response = self.client.get(f'/api/system/image/{self.file.id}')
+        self.assertEqual(response.status_code, 404)
+
+    def test_hidden_from_file_list(self):
+        File.objects.create(name='public.png', save_name='public.png', url='static/public.png')
+        client = auth_client(self.client, self.owner, is_superuser=True)
+        items = client.get('/api/system/file').json()['result']['items']
+        self.assertEqual([item['name'] for item in items], ['public.png'])
+        self.assertEqual(client.get(f'/api/system/file/{self.file.id}').status_code, 404)
+
+
+class GlobalAuthTest(FuTestCase):
+
+    def test_deleted_user_token_is_rejected(self):
+        user = Users.objects.create(username='deleted_admin', name='deleted_admin')
+        client = auth_client(self.client, user, is_superuser=True)
+        self.assertEqual(client.get('/api/system/user').json()['code'], 2000)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.delete()
+        self.assertEqual(client.get('/api/system/user').json()['code'], 401)
+
+
+class PermissionInvalidationTest(FuTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = Users.objects.create(username='staff', name='staff')
+        menu = Menu.objects.create(title='岗位管理', type=1)
+        self.button = MenuButton.objects.create(menu=menu, name='岗位列表', code='post:list', api='/api/system/post',
+                                                method=0)
+        self.role = Role.objects.create(name='staff', code='staff', data_range=1)
+        self.role.permission.add(self.button)
+        self.user.role.add(self.role)
+
+    def test_removing_role_permission_revokes_api(self):
+        self.assertTrue(has_api_permission(self.user.id, 'GET', '/api/system/post'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.permission.remove(self.button)
+        self.assertFalse(has_api_permission(self.user.id, 'GET', '/api/system/post'))
+
+    def test_removing_user_role_revokes_api(self):
+        self.assertTrue(has_api_permission(self.user.id, 'GET', '/api/system/post'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.role.remove(self.role)
+        self.assertFalse(has_api_permission(self.user.id, 'GET', '/api/system/post'))
+
+    def test_changed_api_is_seen(self):
+        self.assertFalse(has_api_permission(self.user.id, 'GET', '/api/system/dept'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.button.api = '/api/system/dept'
+            self.button.save()
+        self.assertTrue(has_api_permission(self.user.id, 'GET', '/api/system/dept'))
+
+    def test_role_data_range_change_is_seen(self):
+        self.assertEqual(get_data_scope(self.user.id).data_range, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.data_range = 4
+            self.role.save()
+        self.assertEqual(get_data_scope(self.user.id).data_range, 4)
+
+
+class BuildTreeTest(TestCase):
+
+    @staticmethod
+    def ids(nodes):
+        return [(node['id'], BuildTreeTest.ids(node.get('children', []))) for node in nodes]
+
+    def test_children_keep_data_order(self):
+        data = [{'id': 1, 'parent_id': None}, {'id': 3, 'parent_id': 1}, {'id': 2, 'parent_id': 1},
+                {'id': 4, 'parent_id': 3}]
+        roots = build_tree(data)
+        self.assertEqual(self.ids(roots), [(1, [(3, [(4, [])]), (2, [])])])
+        self.assertEqual([roots[0]['choice'], roots[0]['children'][1]['choice']], [0, 1])
+        self.assertNotIn('children', roots[0]['children'][1])
+
+    def test_orphans_become_roots(self):
+        # 父节点不在数据中(如按权限过滤掉了父菜单)
+        data = [{'id': 1, 'parent_id': None}, {'id': 2, 'parent_id': 99}, {'id': 3, 'parent_id': 2}]
+        self.assertEqual(self.ids(build_tree(data)), [(1, []), (2, [(3, [])])])
+
+    def test_cycle_is_broken(self):
+        data = [{'id': 1, 'parent_id': None}, {'id': 2, 'parent_id': 3}, {'id': 3, 'parent_id': 2},
+                {'id': 4, 'parent_id': 4}]
+        roots = build_tree(data)
+        # 每个节点只出现一次，环从首个未访问的节点处断开
+        self.assertEqual(self.ids(roots), [(1, []), (2, [(3, [])]), (4, [])])
+
+
+class DeptCacheTest(FuTestCase):
+
+    def test_new_and_moved_depts_are_seen(self):
+        root = Dept.objects.create(name='总部')
+        child = Dept.objects.create(name='研发部', parent=root)
+        other = Dept.objects.create(name='分部')
+        self.assertEqual(sorted(get_dept(root.id)), [root.id, child.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            grandchild = Dept.objects.create(name='前端组', parent=child)
+        self.assertEqual(sorted(get_dept(root.id)), [root.id, child.id, grandchild.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            child.parent = other
+            child.save()
+        self.assertEqual(get_dept(root.id), [root.id])
+        self.assertEqual(sorted(get_dept(other.id)), sorted([other.id, child.id, grandchild.id]))
+
+
+class RouteTreeCacheTest(FuTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = Users.objects.create(username='route', name='route')
+        self.role = Role.objects.create(name='route', code='route')
+        self.user.role.add(self.role)
+        self.menu = Menu.objects.create(title='系统管理', type=0)
+        self.role.menu.add(self.menu)
+
+    def route_titles(self, is_superuser=False):
+        response = auth_client(self.client, self.user, is_superuser).get('/api/system/menu/route/tree')
+        return [item['meta']['title'] for item in json.loads(response.content)['result']]
+
+    def test_menu_changes_are_seen(self):
+        self.assertEqual(self.route_titles(is_superuser=True), ['系统管理'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Menu.objects.create(title='监控', type=0)
+        self.assertEqual(sorted(self.route_titles(is_superuser=True)), ['监控', '系统管理'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.menu.title = '系统设置'
+            self.menu.save()
+        self.assertEqual(sorted(self.route_titles(is_superuser=True)), ['监控', '系统设置'])
+
+    def test_role_menu_changes_are_seen(self):
+        self.assertEqual(self.route_titles(), ['系统管理'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.menu.remove(self.menu)
+        self.assertEqual(self.route_titles(), [])
+
+
+class CursorPaginationTest(FuTestCase):
+
+    def setUp(self):
+        super().setUp()
+        now = datetime(2022, 1, 1)
+        logs = LoginLog.objects.bulk_create(LoginLog(username=f'user{i}') for i in range(11))
+        # 部分记录时间相同、部分为空，翻页时不能重复或遗漏
+        for index, log in enumerate(logs):
+            create_datetime = None if index % 4 == 0 else now + timedelta(minutes=index // 3)
+            LoginLog.objects.filter(id=log.id).update(create_datetime=create_datetime)
+        self.ids = {log.id for log in logs}
+
+    def test_walk_returns_every_row_once(self):
+        paginator = CursorPagination()
+        seen = []
+        cursor = None
+        while True:
+            page = paginator.paginate_queryset(LoginLog.objects.all(),
+                                               CursorPagination.Input(pageSize=3, cursor=cursor))
+            seen.extend(item.id for item in page['items'])
+            cursor = page['next']
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), len(self.ids))
+        self.assertEqual(set(seen), self.ids)
+
+    def test_bad_cursor_returns_400(self):
+        client = auth_client(self.client, Users.objects.create(username='cursor', name='cursor'),
+                             is_superuser=True)
+        # 非 base64、对象、长度不对、字段类型不对
+        for cursor in ('!!', 'e30', 'eyIwIjoxfQ', 'WzFd', 'WyJ4IiwgMV0'):
+            response = client.get('/api/system/login_log/cursor/list', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+
+
+class ImportTest(FuTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = Users.objects.create(username='importer', name='importer')
+        self.user_info = {'id': self.user.id, 'name': self.user.name, 'dept': None}
+        # 导入接口的文件路径相对于 BASE_DIR
+        self.directory = tempfile.TemporaryDirectory(dir=BASE_DIR)
+        self.addCleanup(self.directory.cleanup)
+
+    def write_workbook(self, rows):
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append(['岗位名称', '岗位编码', '岗位状态'])
+        for row in rows:
+            ws.append(row)
+        path = os.path.join(self.directory.name, 'post.xlsx')
+        wb.save(path)
+        return path
+
+    def test_row_error_rolls_back_earlier_batches(self):
+        path = self.write_workbook([['a', 'a', 1], ['b', 'b', 1], ['c', 'c', 1], ['d', 'd', 'bad']])
+        report = run_import(self.user_info, Post, PostSchemaIn, path, ['name', 'code', 'status'], batch_size=2)
+        self.assertEqual(report['total'], 4)
+        self.assertEqual(report['created'], 0)
+        self.assertEqual([error['row'] for error in report['errors']], [5])
+        self.assertFalse(Post.objects.exists())
+
+    def test_valid_file_is_imported(self):
+        path = self.write_workbook([['a', 'a', 1], ['b', 'b', 0], ['c', 'c', 1]])
+        report = run_import(self.user_info, Post, PostSchemaIn, path, ['name', 'code', 'status'], batch_size=2)
+        self.assertEqual(report, {'total': 3, 'created': 3, 'errors': []})
+        self.assertEqual(list(Post.objects.order_by('code').values_list('code', 'creator_id')),
+                         [('a', self.user.id), ('b', self.user.id), ('c', self.user.id)])
+
+    def test_import_with_row_errors_returns_400(self):
+        path = self.write_workbook([['a', 'a', 'bad']])
+        client = auth_client(self.client, self.user, is_superuser=True)
+        response = client.post('/api/system/post/all/import', {'path': path[len(str(BASE_DIR)):]},
+                               content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)['result']['errors'][0]['row'], 2)
@@ -9,32 +9,31 @@ import re
 from datetime import datetime
 
 # from django.core.cache import cache
-from fuadmin.settings import DEMO, SECRET_KEY, WHITE_LIST
+from fuadmin.settings import DEMO, WHITE_LIST
 from ninja.security import HttpBearer
-from system.models import MenuButton, Users
 
-from .fu_jwt import FuJwt
 from .fu_ninja import FuFilters
-from .usual import get_dept, get_user_info_from_token
+from .fu_permission import get_data_scope, has_api_permission, is_active_user
+from .usual import get_dept, get_request_jwt, get_user_info_from_token
 
-METHOD = {
-    'GET': 0,
-    'POST': 1,
-    'PUT': 2,
-    'DELETE': 3,
-}
+# 匹配以‘/数字’结尾的路径
+ID_SUFFIX = re.compile(r'/\d+$')
 
 
 class GlobalAuth(HttpBearer):
+    # False 时只校验 token 和用户状态，不校验接口权限，由接口自己判断(见 OwnerAuth)
+    check_api_permission = True
+
     def authenticate(self, request, token):
-        jwt = FuJwt(SECRET_KEY)
-        value = jwt.decode(SECRET_KEY, token)
+        value = get_request_jwt(request, token)
         time_now = int(datetime.now().timestamp())
         # 判断token是否过期
         if value.valid_to >= time_now:
             token_user = value.payload
             token_user_id = token_user['id']
-            user = Users.objects.get(id=token_user_id)
+            # 用户被删除或禁用后 token 立即失效，结果缓存在进程内，不在每次请求查询数据库
+            if not is_active_user(token_user_id):
+                raise TimeoutError(401, '用户不存在或已被禁用')
             request_path = request.path
             request_method = request.method
             if DEMO:
@@ -47,9 +46,9 @@ class GlobalAuth(HttpBearer):
                     raise TimeoutError(403, '演示环境')
             else:
                 # 判断是否是超级管理员
-                if not token_user['is_superuser']:
+                if not token_user['is_superuser'] and self.check_api_permission:
                     # 判断是path是否是‘/数字’结尾
-                    result = re.search(r'/\d+$', request_path)
+                    result = ID_SUFFIX.search(request_path)
                     if result:
                         match_value = result.group()
                         # 将数字结尾的接口替换成.*? 因为接口中是/{id}
@@ -58,10 +57,8 @@ class GlobalAuth(HttpBearer):
                     if request_path in WHITE_LIST:
                         return token
                     else:
-                        menuIds = user.role.values_list('permission__id', flat=True)
-                        queryset = MenuButton.objects.filter(id__in=menuIds, api__regex=request_path,
-                                                             method=METHOD[request_method])
-                        if queryset.exists():
+                        # 使用进程内缓存的角色接口索引判断，不再每次请求查询数据库
+                        if has_api_permission(token_user_id, request_method, request_path):
                             return token
                         else:
                             raise TimeoutError(403, '没有权限')
@@ -72,16 +69,21 @@ class GlobalAuth(HttpBearer):
             raise TimeoutError(401, 'token时间过期')
 
 
+class OwnerAuth(GlobalAuth):
+    """
+    只要求登录，用于只允许资源创建人(或超级管理员)访问的接口，如后台导出文件下载、后台任务查询；
+    这类接口地址中带有资源id，无法在菜单按钮中配置接口权限
+    """
+    check_api_permission = False
+
+
 def data_permission(request, filters: FuFilters):
     user_info = get_user_info_from_token(request)
     if user_info['is_superuser']:
         return filters
-    user = Users.objects.get(id=user_info['id'])
-    data_range_qs = user.role.values_list('data_range', flat=True)
-    dept_ids = user.role.values_list('dept__id', flat=True)
-
     # 如果有多个角色，取数据权限最大的角色
-    data_range = max(list(data_range_qs))
+    data_scope = get_data_scope(user_info['id'])
+    data_range = data_scope.data_range
 
     # 仅本人数据权限
     if data_range == 0:
@@ -98,7 +100,7 @@ def data_permission(request, filters: FuFilters):
 
     # 自定义数据权限
     if data_range == 3:
-        filters.belong_dept__in = list(dept_ids)
+        filters.belong_dept__in = list(data_scope.dept_ids)
 
     # 所有数据权限
     if data_range == 4:
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+# @FileName: fu_cache.py
+# @Software: PyCharm
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .fu_metrics import registry
+
+_MISSING = object()
+
+
+def bump_version(version_key):
+    """递增 django cache 中的版本号，缓存服务不可用时返回 None"""
+    try:
+        try:
+            return cache.incr(version_key)
+        except ValueError:
+            cache.set(version_key, 1, timeout=None)
+            return 1
+    except Exception:
+        return None
+
+
+class LocalVersionCache:
+    """
+    进程内 LRU 缓存，多进程之间通过 django cache 中的版本号失效。
+
+    命中时只读本进程内存；每隔 LOCAL_CACHE_CHECK_INTERVAL 秒才去 django cache 中检查一次版本号，
+    其他进程调用 invalidate() 后，本进程最迟在一个检查周期后丢弃旧数据。
+    缓存服务不可用时版本号可能没有递增成功，本进程会在之后的检查中重试；
+    另外每条数据最多保留 LOCAL_CACHE_MAX_AGE 秒，保证失效通知丢失时旧数据也不会一直存在。
+    """
+
+    def __init__(self, name, maxsize=1024):
+        self.name = name
+        self.maxsize = maxsize
+        self.version_key = f'fu:local_cache:{name}:version'
+        self._data = OrderedDict()
+        self._version = None
+        self._checked_at = 0.0
+        # 本地数据每被清空一次加 1，用于丢弃清空前开始生成的值
+        self._generation = 0
+        # 递增共享版本号失败，需要在下次检查时重试
+        self._bump_pending = False
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _check_interval():
+        return getattr(settings, 'LOCAL_CACHE_CHECK_INTERVAL', 1)
+
+    @staticmethod
+    def _max_age():
+        return getattr(settings, 'LOCAL_CACHE_MAX_AGE', 300)
+
+    def _clear(self):
+        self._data.clear()
+        self._generation += 1
+
+    def _bump(self):
+        version = bump_version(self.version_key)
+        self._bump_pending = version is None
+        if version is not None:
+            self._version = version
+
+    def _sync_version(self):
+        """检查共享版本号，发生变化时清空本地数据"""
+        now = time.monotonic()
+        if now - self._checked_at < self._check_interval():
+            return
+        self._checked_at = now
+        if self._bump_pending:
+            self._bump()
+            return
+        try:
+            version = cache.get(self.version_key)
+        except Exception:
+            # 缓存服务不可用时只依赖本进程内的失效和 LOCAL_CACHE_MAX_AGE
+            return
+        if version != self._version:
+            self._clear()
+            self._version = version
+
+    def get(self, key, default=None):
+        with self._lock:
+            self._sync_version()
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            stored_at, value = item
+            if time.monotonic() - stored_at > self._max_age():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, generation=None):
+        """
+        写入缓存
+        :param generation: 生成 value 前读取的 _generation，期间缓存被清空过时放弃写入
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key, builder):
+        """
+        获取缓存，不存在时调用 builder() 生成并写入
+        :param key: 缓存键
+        :param builder: 无参函数，返回需要缓存的值
+        :return:
+        """
+        with self._lock:
+            value = self.get(key, _MISSING)
+            generation = self._generation
+        if value is _MISSING:
+            registry.inc('fu_cache_requests_total', (('cache', self.name), ('result', 'miss')))
+            value = builder()
+            # 生成期间发生了 invalidate() 时不写入，避免旧数据在失效后被写回
+            self.set(key, value, generation)
+        else:
+            registry.inc('fu_cache_requests_total', (('cache', self.name), ('result', 'hit')))
+        return value
+
+    def invalidate(self):
+        """清空本进程缓存，并递增共享版本号通知其他进程"""
+        with self._lock:
+            self._clear()
+            self._bump()
+            self._checked_at = time.monotonic()
+
+
+class SharedVersionCache:
+    """
+    存放在 django cache 中、可被所有进程共享的一组缓存，通过版本号整体失效。
+
+    值与写入时的版本号一起存储，读取时用一次 get_many 同时取回版本号和值，命中只需一次缓存往返。
+    """
+
+    def __init__(self, name, timeout=None):
+        self.name = name
+        self.timeout = timeout
+        self.version_key = f'fu:shared_cache:{name}:version'
+
+    def _key(self, key):
+        return f'fu:shared_cache:{self.name}:{key}'
+
+    def get_or_set(self, key, builder):
+        """
+        获取缓存，不存在或版本号已变化时调用 builder() 生成并写入
+        :param key: 缓存键
+        :param builder: 无参函数，返回需要缓存的值(需可被缓存后端序列化)
+        :return:
+        """
+        cache_key = self._key(key)
+        try:
+            values = cache.get_many([self.version_key, cache_key])
+        except Exception:
+            return builder()
+        version = values.get(self.version_key, 0)
+        item = values.get(cache_key)
+        if item is not None and item[0] == version:
+            registry.inc('fu_cache_requests_total', (('cache', self.name), ('result', 'hit')))
+            return item[1]
+        registry.inc('fu_cache_requests_total', (('cache', self.name), ('result', 'miss')))
+        value = builder()
+        try:
+            # 使用生成前读取的版本号，生成期间发生的失效会让这条缓存在下次读取时作废
+            cache.set(cache_key, (version, value), timeout=self.timeout)
+        except Exception:
+            pass
+        return value
+
+    def invalidate(self):
+        bump_version(self.version_key)
+
+
+# 角色组合 -> 序列化好的前端路由，菜单或角色菜单变更时由 system.signals 失效
+route_tree_cache = SharedVersionCache('route_tree')
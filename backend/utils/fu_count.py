@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# @FileName: fu_count.py
+# @Software: PyCharm
+"""
+分页总数缓存
+
+同一模型、同一查询条件的 count 结果缓存 COUNT_CACHE_TIMEOUT 秒，通过 fu_crud 写入数据时整体失效。
+没有过滤条件的大表(行数估算超过 COUNT_ESTIMATE_THRESHOLD)直接使用数据库统计信息中的估算行数。
+"""
+import hashlib
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from .fu_cache import SharedVersionCache
+
+_count_caches = {}
+
+
+def get_count_cache(model):
+    label = model._meta.label_lower
+    count_cache = _count_caches.get(label)
+    if count_cache is None:
+        count_cache = SharedVersionCache(f'count:{label}', timeout=getattr(settings, 'COUNT_CACHE_TIMEOUT', 10))
+        count_cache = _count_caches.setdefault(label, count_cache)
+    return count_cache
+
+
+def invalidate_count(model):
+    """模型数据有写入时调用，事务提交后使该模型的总数缓存失效"""
+    transaction.on_commit(get_count_cache(model).invalidate)
+
+
+def estimate_count(model, using='default'):
+    """
+    从数据库统计信息中读取表的估算行数
+    :param model: 模型类
+    :param using: 数据库别名
+    :return: 估算行数，数据库不支持或没有统计信息时返回 None
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        # to_regclass 在表不存在时返回 NULL，不会像 ::regclass 一样报错
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)'
+    elif vendor == 'mysql':
+        sql = 'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s'
+    else:
+        return None
+    try:
+        # ATOMIC_REQUESTS 下查询在请求事务中执行，放在保存点里，出错时只回滚保存点，不影响之后的查询
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(sql, [connection.ops.quote_name(table) if vendor == 'postgresql' else table])
+            row = cursor.fetchone()
+    except Exception:
+        return None
+    # postgresql 未 analyze 过的表 reltuples 为 -1 或 0
+    if not row or row[0] is None or row[0] <= 0:
+        return None
+    return int(row[0])
+
+
+def _is_unfiltered(queryset):
+    query = queryset.query
+    return not query.where and not query.distinct and query.low_mark == 0 and query.high_mark is None
+
+
+def _count(queryset):
+    threshold = getattr(settings, 'COUNT_ESTIMATE_THRESHOLD', None)
+    if threshold is not None and _is_unfiltered(queryset):
+        estimate = estimate_count(queryset.model, queryset.db)
+        if estimate is not None and estimate >= threshold:
+            return estimate
+    return queryset.count()
+
+
+def cached_count(queryset):
+    """
+    获取查询集的总数，按模型和查询条件缓存
+    :param queryset: QuerySet 或列表
+    :return: 总数
+    """
+    if not hasattr(queryset, 'query'):
+        return len(queryset)
+    queryset = queryset.order_by()
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except Exception:
+        # 条件必然为空(EmptyResultSet)等情况无法生成 sql
+        return queryset.count()
+    key = hashlib.md5(f'{queryset.db}:{sql}:{params!r}'.encode()).hexdigest()
+    return get_count_cache(queryset.model).get_or_set(key, lambda: _count(queryset))
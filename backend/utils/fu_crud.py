@@ -4,23 +4,39 @@
 # @FileName: usual.py
 # @Software: PyCharm
 # -*- coding: utf-8 -*-
+import hashlib
+import json
 import os
+import time
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
 from urllib.parse import unquote
 
-import openpyxl
-from django.http import FileResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.dispatch import Signal
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from fuadmin.settings import BASE_DIR, STATIC_URL
+from fuadmin.settings import BASE_DIR
 from ninja import Schema
 from openpyxl import load_workbook
+from pydantic import ValidationError
 
 from .fu_auth import data_permission
+from .fu_count import invalidate_count
+from .fu_export import get_exporter
 from .fu_ninja import FuFilters
 from .fu_response import FuResponse
 from .usual import get_user_info_from_token
 
 
+# bulk_create 不会触发 post_save，批量写入后对该模型发送一次，system.signals 中按模型失效相关缓存
+bulk_created = Signal()
+
+
 class ImportSchema(Schema):
     path: str
 
@@ -47,6 +63,7 @@ def create(request, data, model):
     data['belong_dept'] = user_info['dept']
     # 使用提供的模型和数据创建新记录
     query_set = model.objects.create(**data)
+    invalidate_count(model)
     return query_set
 
 
@@ -74,6 +91,8 @@ def batch_create(request, data, model):
         item['belong_dept'] = user_info['dept']
         data_list.append(model(**item))  # 根据字典内容实例化模型对象并添加到列表中
     query_set = model.objects.bulk_create(data_list)  # 批量创建模型实例
+    invalidate_count(model)
+    bulk_created.send(sender=model)
     return query_set
 
 
@@ -92,7 +111,7 @@ def delete(id, model):
     instance = get_object_or_404(model, id=id)
     # 删除对象实例
     instance.delete()
-    pass
+    invalidate_count(model)
 
 
 def update(request, id, data, model):
@@ -117,21 +136,94 @@ def update(request, id, data, model):
     for attr, value in dict_data.items():
         setattr(instance, attr, value)
     instance.save()  # 保存更新
+    invalidate_count(model)  # 过滤条件的字段可能被修改
     return instance  # 返回更新后的实例
 
 
-def retrieve(request, model, filters: FuFilters = FuFilters()):
+def _resolve_model_field(model, name):
+    """按字段名或 attname(如 dept_id)查找模型字段，找不到时返回 None"""
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        for field in model._meta.concrete_fields:
+            if field.attname == name:
+                return field
+    return None
+
+
+@lru_cache(maxsize=None)
+def get_schema_relations(model, schema):
+    """
+    根据输出Schema的字段推导查询需要预加载的关联和读取的字段
+
+    参数:
+    - model: Django模型类。
+    - schema: 输出Schema，字段别名形如 "creator.username" 时按外键关联，多对多、反向关联字段按列表输出。
+
+    返回值:
+    - (select_related 列表, prefetch_related 列表, only 字段列表)，Schema 中有模型之外的字段(如 resolve_ 方法)时
+      无法确定需要哪些列，only 字段列表为 None
+    """
+    select_related = []
+    prefetch_related = []
+    only = []
+    resolvers = getattr(schema, '_ninja_resolvers', {})
+    for name, schema_field in schema.__fields__.items():
+        if name in resolvers:
+            only = None
+            continue
+        current = model
+        lookups = []
+        prefetch = False
+        parts = schema_field.alias.split('.')
+        for i, part in enumerate(parts):
+            field = _resolve_model_field(current, part)
+            if field is None:
+                only = None
+                break
+            lookups.append(field.name)
+            path = '__'.join(lookups)
+            if field.many_to_many or field.one_to_many or not field.concrete:
+                # 多对多、反向关联逐行查询会产生 N+1，改为一次性预加载
+                prefetch = True
+            if i == len(parts) - 1:
+                if prefetch:
+                    if path not in prefetch_related:
+                        prefetch_related.append(path)
+                elif only is not None:
+                    only.append(path)
+            elif field.is_relation:
+                if not prefetch and path not in select_related:
+                    select_related.append(path)
+                current = field.related_model
+            else:
+                only = None
+                break
+    # 已按关联整体预加载的路径不再单独预加载其子路径
+    prefetch_related = [path for path in prefetch_related
+                        if not any(path.startswith(f'{other}__') for other in prefetch_related)]
+    return select_related, prefetch_related, only
+
+
+def retrieve(request, model, filters: FuFilters = None, schema=None, select_related=None,
+             prefetch_related=None, only=None):
     """
     根据提供的过滤条件从数据库中检索模型实例。
 
     参数:
     - request: HttpRequest对象，用于获取请求信息。
     - model: Django模型类，指定要检索的数据模型。
-    - filters: FuFilters类的实例，包含过滤条件。默认为FuFilters()，即无条件过滤。
+    - filters: FuFilters类的实例，包含过滤条件。默认为None，即无条件过滤。
+    - schema: 输出Schema，传入时按 get_schema_relations 自动预加载外键、多对多字段并只读取Schema用到的列，
+      列表接口序列化时查询次数与行数无关。
+    - select_related、prefetch_related: 额外需要预加载的关联，与从Schema推导的合并。
+    - only: 只读取的字段列表，默认从Schema推导，传 False 时读取全部字段。
 
     返回值:
     - query_set: 一个Django QuerySet对象，包含根据过滤条件检索到的模型实例。
     """
+    if filters is None:
+        filters = FuFilters()
     # 根据请求和过滤条件应用数据权限控制
     filters = data_permission(request, filters)
     if filters is not None:
@@ -144,99 +236,430 @@ def retrieve(request, model, filters: FuFilters = FuFilters()):
     else:
         # 如果没有有效的过滤条件，则返回所有模型实例
         query_set = model.objects.all()
+
+    select_related = list(select_related or [])
+    prefetch_related = list(prefetch_related or [])
+    if schema is not None:
+        schema_select, schema_prefetch, schema_only = get_schema_relations(model, schema)
+        select_related += [path for path in schema_select if path not in select_related]
+        prefetch_related += [path for path in schema_prefetch if path not in prefetch_related]
+        if only is None:
+            only = schema_only
+    if select_related:
+        query_set = query_set.select_related(*select_related)
+    if prefetch_related:
+        query_set = query_set.prefetch_related(*prefetch_related)
+    if only:
+        # select_related 的外键本身也必须读取
+        query_set = query_set.only(*only, *[path for path in select_related if path not in only])
     return query_set
 
 
+def get_export_columns(model, scheme, export_fields):
+    """
+    获取导出列的表头和查询字段
+
+    参数:
+    - model: Django模型类。
+    - scheme: 输出Schema，字段别名形如 "creator.username" 时按关联字段查询。
+    - export_fields: 要导出的字段名列表。
+
+    返回值:
+    - (表头列表, values_list 查询字段列表)
+    """
+    titles = []
+    lookups = []
+    scheme_fields = getattr(scheme, '__fields__', {})
+    for field in export_fields:
+        field_obj = getattr(model, field).field
+        titles.append(field_obj.help_text)
+        alias = scheme_fields[field].alias if field in scheme_fields else field
+        lookups.append(alias.replace('.', '__') if '.' in alias else field)
+    return titles, lookups
+
+
+def _is_to_many_lookup(model, lookup):
+    """查询字段是否经过多对多、反向外键关联，这类字段 values_list 会按关联对象展开成多行"""
+    current = model
+    for part in lookup.split('__'):
+        field = _resolve_model_field(current, part)
+        if field is None:
+            return False
+        if field.many_to_many or field.one_to_many:
+            return True
+        if not field.is_relation:
+            return False
+        current = field.related_model
+    return False
+
+
+def iter_export_rows(queryset, model, scheme, export_fields, chunk_size=None, progress=None):
+    """
+    分批读取要导出的数据，内存占用与总行数无关
+    多对多字段(如 role、role__name)每批单独查询后合并为列表，每条数据仍只导出一行，与列表接口一致
+
+    参数:
+    - queryset: 已按数据权限过滤的查询集。
+    - model、scheme、export_fields: 同 export_data。
+    - chunk_size: 每次从数据库读取的行数，默认为 EXPORT_CHUNK_SIZE。
+    - progress: 可选回调 progress(已读取行数)，每读取 chunk_size 行调用一次
+
+    返回值:
+    - 生成器，第一项为表头，之后每项为一行数据的元组
+    """
+    titles, lookups = get_export_columns(model, scheme, export_fields)
+    chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    yield titles
+    many = [index for index, lookup in enumerate(lookups) if _is_to_many_lookup(model, lookup)]
+    count = 0
+    if not many:
+        for row in queryset.values_list(*lookups).iterator(chunk_size=chunk_size):
+            yield row
+            count += 1
+            if progress and count % chunk_size == 0:
+                progress(count)
+    else:
+        single = [lookup for index, lookup in enumerate(lookups) if index not in many]
+        rows = queryset.values_list('pk', *single).iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            pks = [row[0] for row in chunk]
+            related = {}
+            for index in many:
+                values = {}
+                for pk, value in model.objects.filter(pk__in=pks).order_by().values_list('pk', lookups[index]):
+                    if value is not None:
+                        values.setdefault(pk, []).append(value)
+                related[index] = values
+            for row in chunk:
+                single_values = iter(row[1:])
+                yield tuple(related[index].get(row[0], []) if index in related else next(single_values)
+                            for index in range(len(lookups)))
+            count += len(chunk)
+            if progress and len(chunk) == chunk_size:
+                progress(count)
+    if progress:
+        progress(count)
+
+
+def get_export_filters(request):
+    """
+    获取当前用户导出数据时的数据权限过滤条件，用于后台导出任务
+
+    返回值:
+    - 可被 json 序列化的过滤条件字典，传给 model.objects.filter
+    """
+    filters = data_permission(request, FuFilters())
+    return {key: list(value) if isinstance(value, (set, frozenset, tuple)) else value
+            for key, value in filters.dict(exclude_none=True).items()}
+
+
+def get_private_file_path(file_url):
+    """私有文件(后台导出的文件)的完整路径"""
+    return os.path.join(str(getattr(settings, 'EXPORT_ROOT', os.path.join(BASE_DIR, 'private', 'export'))), file_url)
+
+
+def run_export(user_info, model, scheme, export_fields, file_format, filters, progress=None):
+    """
+    导出数据到文件并登记到文件管理，供后台导出任务使用
+
+    参数:
+    - user_info: 导出人信息(token中的用户信息)，用于填充文件的创建人和所属部门
+    - model、scheme、export_fields: 同 export_data
+    - file_format: 导出格式，见 utils.fu_export.EXPORTERS
+    - filters: get_export_filters 返回的过滤条件
+    - progress: 可选回调 progress(已导出行数, 总行数)
+
+    返回值:
+    - 导出结果 {"file_id": 文件id, "name": 文件名, "url": 文件路径, "size": 文件大小, "rows": 导出行数}
+    """
+    from system.models import File
+
+    exporter = get_exporter(file_format)
+    if exporter is None:
+        raise ValueError(f'不支持的导出格式: {file_format}')
+    queryset = model.objects.filter(**filters)
+    total = queryset.count()
+    if exporter.max_rows is not None and total > exporter.max_rows:
+        raise ValueError(f'{file_format} 最多导出 {exporter.max_rows} 行，当前 {total} 行')
+    if progress:
+        # 开始执行后立即离开 PENDING 状态，去重时据此区分已开始和未被消费的任务
+        progress(0, total)
+    rows_done = [0]
+
+    def on_rows(count):
+        rows_done[0] = count
+        if progress:
+            progress(count, total)
+
+    now = datetime.now()
+    file_name = f'{model._meta.verbose_name}_{now.strftime("%Y%m%d%H%M%S%f")}.{exporter.extension}'
+    # 导出文件不放在静态目录，url 为相对 EXPORT_ROOT 的路径
+    file_url = os.path.join(now.strftime('%Y%m%d'), file_name)
+    file_path = get_private_file_path(file_url)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    md5 = hashlib.md5()
+    size = 0
+    rows = iter_export_rows(queryset, model, scheme, export_fields, progress=on_rows)
+    try:
+        with open(file_path, 'wb') as f:
+            for chunk in exporter.iter_content(rows):
+                f.write(chunk)
+                md5.update(chunk)
+                size += len(chunk)
+    except Exception:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    file = File.objects.create(
+        name=file_name,
+        save_name=file_name,
+        url=file_url,
+        size=size,
+        md5sum=md5.hexdigest(),
+        creator_id=user_info['id'],
+        modifier=user_info['name'],
+        belong_dept=user_info['dept'],
+        private=True,
+    )
+    invalidate_count(File)
+    return {"file_id": file.id, "name": file_name, "url": file_url, "size": size, "rows": rows_done[0]}
+
+
+def _task_owner_key(task_id):
+    return f'fu:task_owner:{task_id}'
+
+
+def set_task_owner(task_id, user_id):
+    """记录后台任务的提交人，查询任务状态时只允许提交人查看"""
+    cache.set(_task_owner_key(task_id), user_id, timeout=getattr(settings, 'TASK_OWNER_TIMEOUT', 86400))
+
+
+def get_task_owner(task_id):
+    """后台任务的提交人id，未记录或已过期时返回 None"""
+    return cache.get(_task_owner_key(task_id))
+
+
+def release_export_job(dedupe_key, task_id):
+    """导出任务结束或提交失败后删除去重记录，允许再次提交相同的导出"""
+    job = cache.get(dedupe_key)
+    if isinstance(job, (list, tuple)) and job[0] == task_id:
+        cache.delete(dedupe_key)
+
+
+def _export_job_alive(job):
+    """
+    去重记录中的任务是否仍在进行: 已结束的任务不算；
+    PENDING 也可能是消息丢失、永远不会执行的任务，提交超过 EXPORT_JOB_PENDING_TIMEOUT 秒仍未开始时不算
+    """
+    from celery import states
+    from fuadmin.celery import app
+
+    if not isinstance(job, (list, tuple)) or len(job) != 2:
+        return False
+    task_id, submitted_at = job
+    state = app.AsyncResult(task_id).state
+    if state in states.READY_STATES:
+        return False
+    if state == states.PENDING:
+        return time.time() - submitted_at < getattr(settings, 'EXPORT_JOB_PENDING_TIMEOUT', 600)
+    return True
+
+
+def export_job(request, model, scheme, export_fields, file_format):
+    """
+    提交后台导出任务，相同用户、相同导出参数的任务未完成时直接返回该任务，不重复提交
+
+    返回值:
+    - (任务id, 是否为已存在的任务)
+    """
+    from celery.utils import uuid
+    from system.tasks import export_data_task
+
+    user_info = get_user_info_from_token(request)
+    filters = get_export_filters(request)
+    scheme_path = f'{scheme.__module__}.{scheme.__qualname__}'
+    params = json.dumps([user_info['id'], model._meta.label, scheme_path, list(export_fields), file_format, filters],
+                        sort_keys=True, default=str)
+    dedupe_key = f'fu:export_job:{hashlib.md5(params.encode()).hexdigest()}'
+    timeout = getattr(settings, 'EXPORT_JOB_DEDUPE_TIMEOUT', 3600)
+    task_id = uuid()
+    # 同时记录提交时间，用于识别一直 PENDING 的任务
+    job = (task_id, time.time())
+    if not cache.add(dedupe_key, job, timeout=timeout):
+        existing = cache.get(dedupe_key)
+        if _export_job_alive(existing):
+            return existing[0], True
+        cache.set(dedupe_key, job, timeout=timeout)
+    set_task_owner(task_id, user_info['id'])
+    try:
+        export_data_task.apply_async(
+            args=(model._meta.label, scheme_path, list(export_fields), file_format, filters, user_info, dedupe_key),
+            task_id=task_id,
+        )
+    except Exception:
+        # 消息队列不可用时清理记录，避免相同的导出一直返回不会执行的任务
+        release_export_job(dedupe_key, task_id)
+        cache.delete(_task_owner_key(task_id))
+        raise
+    return task_id, False
+
+
+def submit_export_job(request, model, scheme, export_fields, file_format, msg=None):
+    """提交后台导出任务并返回任务id，消息队列不可用时返回 503"""
+    try:
+        task_id, existing = export_job(request, model, scheme, export_fields, file_format)
+    except Exception as exc:
+        return FuResponse(code=503, msg=f'导出任务提交失败: {exc}', status=503)
+    return FuResponse(data={'task_id': task_id}, msg='导出任务进行中' if existing else msg or '导出任务已提交')
+
+
 def export_data(request, model, scheme, export_fields):
     """
-    导出数据为Excel文件。
+    导出数据，请求参数 format 选择导出格式: csv(默认)、xlsx、jsonl、parquet(需安装 pyarrow)。
+
+    所有格式共用 iter_export_rows 分批读取数据，通过 StreamingHttpResponse 按块输出，不在静态目录中生成导出文件。
+    请求参数 background=1 时交给 celery 在后台导出到文件，返回任务id；
+    通过 /system/task/{task_id} 查询进度，完成后通过 /system/file/{file_id}/download 下载。
+    xlsx 需要生成完整个文件才能输出，超过 EXPORT_XLSX_STREAM_MAX_ROWS 行时自动转为后台导出；超过 xlsx 行数上限时直接返回 400。
 
     参数:
     - request: HttpRequest对象，表示客户端请求。
     - model: Django模型类，指定要导出数据的模型。
-    - scheme: 表示数据转换规则的对象，用于将ORM对象转换为字典。
+    - scheme: 输出Schema，用于确定关联字段的显示值，后台导出时需定义在模块顶层以便任务导入。
     - export_fields: 包含要导出的字段名的列表。
 
     返回值:
-    - FileResponse对象，提供下载Excel文件。
+    - StreamingHttpResponse对象，提供下载文件；后台导出时返回任务id；格式不支持或行数超限时返回错误信息。
     """
+    file_format = request.GET.get('format') or 'csv'
+    exporter = get_exporter(file_format)
+    if exporter is None:
+        return FuResponse(code=400, msg=f'不支持的导出格式: {file_format}', status=400)
+    queryset = retrieve(request, model)
+    total = None
+    if exporter.max_rows is not None or not exporter.streaming:
+        total = queryset.count()
+        if exporter.max_rows is not None and total > exporter.max_rows:
+            msg = f'{file_format} 最多导出 {exporter.max_rows} 行，当前 {total} 行，请使用 csv 格式'
+            return FuResponse(code=400, msg=msg, status=400)
+    if request.GET.get('background') in ('1', 'true'):
+        return submit_export_job(request, model, scheme, export_fields, file_format)
+    if not exporter.streaming and total > getattr(settings, 'EXPORT_XLSX_STREAM_MAX_ROWS', 10000):
+        return submit_export_job(request, model, scheme, export_fields, file_format, msg='数据较多，已转为后台导出')
+    file_name = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    rows = iter_export_rows(queryset, model, scheme, export_fields)
+    response = StreamingHttpResponse(exporter.iter_content(rows), content_type=exporter.content_type)
+    response['Content-Disposition'] = f'attachment; filename="{file_name}.{exporter.extension}"'
+    return response
+
+
+def run_import(user_info, model, scheme, file_path, import_fields, batch_size=None, progress=None):
+    """
+    从Excel文件批量导入数据，整个导入在一个事务中，任意一行校验失败则全部回滚。
 
-    title_dict = {}
-    # 根据export_fields列表获取字段的显示名称
-    for field in export_fields:
+    参数:
+    - user_info: 导入人信息(token中的用户信息)，用于填充创建人、修改人和所属部门
+    - model: Django模型类，数据将被导入到这个模型
+    - scheme: 输入Schema，用于校验每一行数据
+    - file_path: Excel文件的完整路径
+    - import_fields: 一个列表，指定模型中需要导入的字段名
+    - batch_size: 每批校验、写入的行数，默认为 IMPORT_BATCH_SIZE
+    - progress: 可选回调 progress(已处理行数, 总行数)，每处理完一批调用一次
+
+    返回值:
+    - 导入结果 {"total": 数据行数, "created": 写入行数, "errors": [{"row": Excel行号, "error": 错误信息}]}
+    """
+    batch_size = batch_size or getattr(settings, 'IMPORT_BATCH_SIZE', 1000)
+    max_errors = getattr(settings, 'IMPORT_MAX_ERRORS', 100)
+    title_dict = {}  # 字段名与Excel列对应的字典
+    for field in import_fields:
         field_obj = getattr(model, field).field
-        title_dict[field] = field_obj.help_text
-
-    qs = retrieve(request, model)
-    list_data = []
-    # 将查询集中的每一项转换为指定格式的字典
-    for qs_item in qs:
-        qs_item = scheme.from_orm(qs_item)
-        dict_data = {}
-        for item, value in title_dict.items():
-            dict_data[value] = getattr(qs_item, item)
-        list_data.append(dict_data)
-
-    # 创建并初始化Excel工作簿
-    wb = openpyxl.Workbook()
+        title_dict[field_obj.help_text] = field_obj.column
+
+    # 只读模式按行读取，不把整个工作簿加载到内存
+    wb = load_workbook(file_path, read_only=True)
     ws = wb.active
-    # 向Excel中写入数据
-    for index, data in enumerate(list_data):
-        if index == 0:
-            # 写入表头
-            ws.append(list(data.keys()))
-        ws.append(list(data.values()))
-
-    # 生成唯一的文件名并设置文件路径
-    file_name = datetime.now().strftime('%Y%m%d%H%M%S%f') + '.xlsx'
-    current_ymd = datetime.now().strftime('%Y%m%d')
-    file_path = os.path.join(STATIC_URL, current_ymd)
-    file_url = os.path.join(file_path, file_name)
-    # 确保导出文件的目录存在
-    if not os.path.exists(file_path):
-        os.makedirs(file_path)
-
-    # 保存Excel文件到指定路径
-    wb.save(file_url)
-    # 返回供下载的文件响应
-    return FileResponse(open(file_url, "rb"), as_attachment=True)
+    total_rows = max((ws.max_row or 1) - 1, 0)
+    report = {"total": 0, "created": 0, "errors": []}
+    try:
+        rows = ws.iter_rows(values_only=True)
+        title_value = next(rows, None) or ()
+        # 表头对应的字段，None 表示该列不导入
+        columns = [title_dict.get(title) for title in title_value]
+        with transaction.atomic():
+            batch = []
+            for index_row, row in enumerate(rows, start=2):
+                if not any(cell is not None for cell in row):
+                    continue
+                report["total"] += 1
+                dict_data = {column: cell for column, cell in zip(columns, row) if column is not None}
+                try:
+                    item = scheme(**dict_data).dict()
+                except ValidationError as e:
+                    if len(report["errors"]) < max_errors:
+                        report["errors"].append({"row": index_row, "error": str(e)})
+                    continue
+                item['creator_id'] = user_info['id']
+                item['modifier'] = user_info['name']
+                item['belong_dept'] = user_info['dept']
+                batch.append(model(**item))
+                if len(batch) >= batch_size:
+                    if not report["errors"]:
+                        model.objects.bulk_create(batch, batch_size=batch_size)
+                        report["created"] += len(batch)
+                    batch = []
+                    if progress:
+                        progress(report["total"], total_rows)
+            if batch and not report["errors"]:
+                model.objects.bulk_create(batch, batch_size=batch_size)
+                report["created"] += len(batch)
+            if report["errors"]:
+                # 有错误时回滚已写入的数据
+                transaction.set_rollback(True)
+                report["created"] = 0
+    finally:
+        wb.close()
+    if report["created"]:
+        invalidate_count(model)
+        bulk_created.send(sender=model)
+    if progress:
+        progress(report["total"], total_rows)
+    return report
 
 
 def import_data(request, model, scheme, data, import_fields):
     """
-    导入数据到指定模型
+    导入数据到指定模型，请求参数 background=1 时交给 celery 在后台执行并返回任务id
 
     参数:
     - request: HttpRequest对象，表示客户端请求
     - model: Django模型类，数据将被导入到这个模型
-    - scheme: 一个函数，用于根据给定的数据字典创建模型实例
+    - scheme: 输入Schema，用于校验每一行数据，需定义在模块顶层以便后台任务导入
     - data: 包含要导入文件信息的对象，比如上传的Excel文件
     - import_fields: 一个列表，指定模型中需要导入的字段名
 
     返回值:
-    - FuResponse对象，包含导入结果的消息
+    - FuResponse对象，包含导入结果或后台任务id
     """
-    title_dict = {}  # 字段名与Excel列对应的字典
-    for field in import_fields:
-        field_obj = getattr(model, field).field
-        title_dict[field_obj.help_text] = field_obj.column
+    user_info = get_user_info_from_token(request)
     # 文件路径处理
     file_path = str(BASE_DIR) + unquote(data.path)
-    # 加载Excel工作簿
-    wb = load_workbook(file_path)
-    ws = wb.active  # 获取活动工作表
-    title_value = []
-    for index_row, row in enumerate(ws.values):
-        if index_row == 0:
-            title_value = row  # 读取Excel表头
-        else:
-            dict_data = {}  # 存储每一行数据转换后的字典
-            for index, cell in enumerate(row):
-                title_cell = title_value[index]
-                value = title_dict.get(title_cell)  # 根据表头查找对应字段
-                if value is not None:
-                    dict_data[value] = cell
-            print(dict_data)  # 打印处理后的数据，用于调试
-            data = scheme(**dict_data)  # 根据处理后的字典创建模型实例
-            create(request, data, model)  # 在数据库中创建模型实例
-    return FuResponse(msg='导入成功')  # 返回成功消息
+    if request.GET.get('background') in ('1', 'true'):
+        from celery.utils import uuid
+        from system.tasks import import_data_task
+        task_id = uuid()
+        set_task_owner(task_id, user_info['id'])
+        import_data_task.apply_async(
+            args=(model._meta.label, f'{scheme.__module__}.{scheme.__qualname__}', file_path, list(import_fields),
+                  user_info),
+            task_id=task_id,
+        )
+        return FuResponse(data={'task_id': task_id}, msg='导入任务已提交')
+    report = run_import(user_info, model, scheme, file_path, import_fields)
+    if report['errors']:
+        # 数据校验失败属于请求数据错误，返回 400 和错误行
+        return FuResponse(data=report, code=400, msg='导入失败', status=400)
+    return FuResponse(data=report, msg='导入成功')  # 返回成功消息
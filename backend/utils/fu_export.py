@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+# @FileName: fu_export.py
+# @Software: PyCharm
+"""
+导出格式
+
+每种格式实现 iter_content(rows)，按块生成文件内容(bytes)；rows 第一项为表头，之后每项为一行数据。
+通过 register_exporter 可以增加新的格式，导出接口使用请求参数 format 选择，默认 csv。
+"""
+import csv
+import json
+import logging
+from abc import ABC, abstractmethod
+from datetime import date, datetime, time
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+import openpyxl
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Exporter(ABC):
+    extension = ''
+    content_type = 'application/octet-stream'
+    # 格式本身支持的最大数据行数(不含表头)，None 表示不限制
+    max_rows = None
+    # 是否能边读边输出；不能时整个文件生成完才返回第一个字节，数据量大时应转为后台导出
+    streaming = True
+
+    @abstractmethod
+    def iter_content(self, rows):
+        """按块生成文件内容(bytes)"""
+
+
+class CsvExporter(Exporter):
+    extension = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def iter_content(self, rows):
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        # 带 BOM 以便 Excel 正确识别 utf-8
+        yield '\ufeff'.encode()
+        count = 0
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+            # 攒一批再输出，减少响应分块数量
+            if count % 500 == 0:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+
+class JsonLinesExporter(Exporter):
+    extension = 'jsonl'
+    content_type = 'application/x-ndjson; charset=utf-8'
+
+    def iter_content(self, rows):
+        rows = iter(rows)
+        titles = next(rows, [])
+        lines = []
+        for row in rows:
+            lines.append(json.dumps(dict(zip(titles, row)), ensure_ascii=False, default=str))
+            if len(lines) >= 500:
+                yield ('\n'.join(lines) + '\n').encode()
+                lines = []
+        if lines:
+            yield ('\n'.join(lines) + '\n').encode()
+
+
+def to_cell_value(value):
+    """Excel 单元格只能写入基础类型，其余的转换为字符串"""
+    if value is None or isinstance(value, (str, int, float, bool, datetime, date, time, Decimal)):
+        return value
+    return str(value)
+
+
+class XlsxExporter(Exporter):
+    """openpyxl 只写模式，xlsx 为 zip 格式无法边写边输出，写入内存后按块返回"""
+    extension = 'xlsx'
+    content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    # 工作表最多 1048576 行，其中一行为表头
+    max_rows = 1048575
+    streaming = False
+    chunk_size = 64 * 1024
+
+    def iter_content(self, rows):
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet()
+        for row in rows:
+            ws.append([to_cell_value(value) for value in row])
+        output = BytesIO()
+        wb.save(output)
+        output.seek(0)
+        while True:
+            chunk = output.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+class _ChunkSink:
+    """供 pyarrow 写入的伪文件，每写完一个 row group 取出已写入的内容"""
+
+    def __init__(self):
+        self.buffer = BytesIO()
+        self.closed = False
+
+    def write(self, data):
+        self.buffer.write(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        value = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return value
+
+
+class ParquetExporter(Exporter):
+    """列式存储格式，需要安装 pyarrow；每 EXPORT_CHUNK_SIZE 行写一个 row group"""
+    extension = 'parquet'
+    content_type = 'application/vnd.apache.parquet'
+
+    def iter_content(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        rows = iter(rows)
+        titles = [str(title) for title in next(rows, [])]
+        batch_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+        sink = _ChunkSink()
+        writer = None
+        schema = None
+        batch = []
+
+        def to_table(batch):
+            columns = list(zip(*batch)) if batch else [[] for _ in titles]
+            if schema is None:
+                arrays = []
+                for column in columns:
+                    # 同一列中有多种类型(如 JSON 字段)时按字符串处理，避免后面的数据无法转换为第一批推断的类型
+                    if len({type(v) for v in column if v is not None}) > 1:
+                        array = to_strings(column)
+                    else:
+                        try:
+                            array = pa.array(column)
+                        except (pa.ArrowInvalid, pa.ArrowTypeError):
+                            array = to_strings(column)
+                    # 整列为空时无法推断类型，按字符串处理
+                    if pa.types.is_null(array.type):
+                        array = array.cast(pa.string())
+                    arrays.append(array)
+                return pa.Table.from_arrays(arrays, names=titles)
+            arrays = []
+            for column, field in zip(columns, schema):
+                try:
+                    arrays.append(pa.array(column, type=field.type))
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    arrays.append(to_type(column, field))
+            return pa.Table.from_arrays(arrays, schema=schema)
+
+        def to_strings(column):
+            return pa.array([None if v is None else str(v) for v in column], type=pa.string())
+
+        def to_type(column, field):
+            """
+            第一批数据已确定了列类型，后面的数据无法整体转换时逐个转换，
+            仍无法转换的值写为空并记录警告，不中断已经开始输出的文件
+            """
+            try:
+                return to_strings(column).cast(field.type)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                pass
+            values = []
+            failed = 0
+            for value in column:
+                try:
+                    values.append(None if value is None else pa.scalar(value, type=field.type).as_py())
+                except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, TypeError, ValueError):
+                    values.append(None)
+                    failed += 1
+            if failed:
+                logger.warning(f'导出 parquet 时列 {field.name} 有 {failed} 个值无法转换为 {field.type}，已写为空')
+            return pa.array(values, type=field.type)
+
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                table = to_table(batch)
+                if writer is None:
+                    schema = table.schema
+                    writer = pq.ParquetWriter(sink, schema)
+                writer.write_table(table)
+                batch = []
+                yield sink.take()
+        if batch or writer is None:
+            table = to_table(batch)
+            if writer is None:
+                schema = table.schema
+                writer = pq.ParquetWriter(sink, schema)
+            writer.write_table(table)
+        writer.close()
+        yield sink.take()
+
+
+EXPORTERS = {
+    'xlsx': XlsxExporter(),
+    'csv': CsvExporter(),
+    'jsonl': JsonLinesExporter(),
+    'parquet': ParquetExporter(),
+}
+
+
+def register_exporter(name, exporter):
+    """注册导出格式"""
+    EXPORTERS[name] = exporter
+
+
+def get_exporter(name):
+    """
+    获取导出格式，parquet 在未安装 pyarrow 时不可用
+    :param name: 格式名
+    :return: Exporter，不支持时返回 None
+    """
+    exporter = EXPORTERS.get(name)
+    if isinstance(exporter, ParquetExporter):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return None
+    return exporter
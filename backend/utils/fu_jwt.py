@@ -3,11 +3,14 @@
 # @Author  : 臧成龙
 # @FileName: fu_jwt.py
 # @Software: PyCharm
+from collections import OrderedDict
 from typing import Union
 from simplejwt import util
 from simplejwt.jwt import default_alg, _hash, Jwt
 import datetime
 import json
+import threading
+import time
 
 
 class DateEncoder(json.JSONEncoder):
@@ -56,3 +59,62 @@ def encode(secret: Union[str, bytes], payload: dict = None, alg: str = default_a
 
 	token = util.join(pre_signature, signature_b64)
 	return util.from_bytes(token)
+
+
+class DecodedTokenCache:
+	"""
+	已验签token的进程内LRU缓存，按签名段作为键，到达 valid_to 后失效。
+	命中时还会比较 header.payload 部分，防止签名被拼接到篡改过的payload上。
+	"""
+
+	def __init__(self, maxsize: int = 4096):
+		self.maxsize = maxsize
+		self._data = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, token: str) -> Union[Jwt, None]:
+		pre_signature, _, signature = token.rpartition('.')
+		with self._lock:
+			item = self._data.get(signature)
+			if item is None:
+				return None
+			cached_pre_signature, jwt = item
+			if cached_pre_signature != pre_signature:
+				return None
+			if jwt.valid_to is not None and jwt.valid_to < time.time():
+				del self._data[signature]
+				return None
+			self._data.move_to_end(signature)
+			return jwt
+
+	def set(self, token: str, jwt: Jwt):
+		if jwt.valid_to is not None and jwt.valid_to < time.time():
+			return
+		pre_signature, _, signature = token.rpartition('.')
+		with self._lock:
+			self._data[signature] = (pre_signature, jwt)
+			self._data.move_to_end(signature)
+			while len(self._data) > self.maxsize:
+				self._data.popitem(last=False)
+
+	def clear(self):
+		with self._lock:
+			self._data.clear()
+
+
+token_cache = DecodedTokenCache()
+
+
+def decode(secret: Union[str, bytes], token: str, alg: str = default_alg) -> Jwt:
+	"""
+	解码并验签token，已验证过且未过期的token直接从缓存返回
+	:param secret: 密钥
+	:param token: token字符串(不含bearer前缀)
+	:param alg: 签名算法
+	:return: Jwt，payload 为多个请求共享，调用方不要修改
+	"""
+	jwt = token_cache.get(token)
+	if jwt is None:
+		jwt = FuJwt.decode(secret, token, alg)
+		token_cache.set(token, jwt)
+	return jwt
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+# @FileName: fu_metrics.py
+# @Software: PyCharm
+"""
+Prometheus 格式的接口指标
+
+每个线程把计数写入自己的分片(threading.local)，记录时不加锁，输出时再合并所有分片。
+线程结束后它的分片合并到基础分片中，分片数量不随请求线程的创建而增长。
+多进程(gunicorn 多个 worker)时配置 METRICS_MULTIPROC_DIR，每个进程定期把自己的计数写入该目录下的一个文件，
+/metrics 读取目录中所有文件求和后输出，已退出进程的文件在读取时删除。
+"""
+import bisect
+import glob
+import json
+import os
+import re
+import threading
+import time
+import weakref
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+# 各类直方图的桶上限
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+HISTOGRAMS = {
+    'fu_http_request_duration_seconds': ('接口耗时(秒)', LATENCY_BUCKETS),
+    'fu_http_request_db_seconds': ('接口内数据库查询耗时(秒)', LATENCY_BUCKETS),
+    'fu_http_request_queries': ('接口内数据库查询次数', QUERY_COUNT_BUCKETS),
+    'fu_http_response_size_bytes': ('响应体大小(字节)', SIZE_BUCKETS),
+}
+COUNTERS = {
+    'fu_http_requests_total': '请求数',
+    'fu_cache_requests_total': '进程内/共享缓存的读取次数',
+}
+
+
+class MetricsRegistry:
+    """
+    指标注册表
+    histograms: {(指标名, 标签): [各桶计数..., +Inf桶计数, 总和, 次数]}
+    counters: {(指标名, 标签): 数值}
+    标签为 ((名称, 值), ...) 元组
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        # 已结束线程的计数合并到基础分片
+        self._base = ({}, {})
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None or self._pid != os.getpid():
+            if self._pid != os.getpid():
+                # fork 之后不继承父进程的计数
+                with self._shards_lock:
+                    self._base = ({}, {})
+                    self._shards = []
+                    self._pid = os.getpid()
+            shard = ({}, {})
+            self._local.shard = shard
+            # 只有新线程第一次记录时才加锁
+            with self._shards_lock:
+                self._shards.append(shard)
+            weakref.finalize(threading.current_thread(), self._retire, shard)
+        return shard
+
+    def _retire(self, shard):
+        """线程结束(线程对象被回收)后把它的分片合并到基础分片"""
+        with self._shards_lock:
+            if not any(item is shard for item in self._shards):
+                return
+            self._shards = [item for item in self._shards if item is not shard]
+            _merge(self._base, shard)
+
+    def observe(self, name, labels, value):
+        histograms = self._shard()[0]
+        key = (name, labels)
+        item = histograms.get(key)
+        buckets = HISTOGRAMS[name][1]
+        if item is None:
+            item = histograms[key] = [0] * (len(buckets) + 3)
+        item[bisect.bisect_left(buckets, value)] += 1
+        item[-2] += value
+        item[-1] += 1
+
+    def inc(self, name, labels, value=1):
+        counters = self._shard()[1]
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def collect(self):
+        """合并本进程所有线程的分片"""
+        result = ({}, {})
+        with self._shards_lock:
+            _merge(result, self._base)
+            shards = list(self._shards)
+        for shard in shards:
+            _merge(result, shard)
+        return result
+
+
+def _merge(target, shard):
+    """把分片 shard 的计数累加到 target"""
+    histograms, counters = target
+    shard_histograms, shard_counters = shard
+    for key, item in list(shard_histograms.items()):
+        merged = histograms.get(key)
+        if merged is None:
+            histograms[key] = list(item)
+        else:
+            for i, value in enumerate(item):
+                merged[i] += value
+    for key, value in list(shard_counters.items()):
+        counters[key] = counters.get(key, 0) + value
+
+
+registry = MetricsRegistry()
+
+
+def _multiproc_dir():
+    return getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+
+
+def _process_file(directory):
+    return os.path.join(directory, f'metrics_{os.getpid()}_{_process_started}.json')
+
+
+_PROCESS_FILE_RE = re.compile(r'metrics_(\d+)_\d+\.json$')
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # 进程存在但属于其他用户
+        return True
+    return True
+
+
+def _prune(path):
+    """删除已退出进程的指标文件，避免重启后的 worker 与旧文件重复累计"""
+    match = _PROCESS_FILE_RE.search(os.path.basename(path))
+    if match is None or path == _process_file(os.path.dirname(path)) or _pid_alive(int(match.group(1))):
+        return False
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    return True
+
+
+_process_started = int(time.time())
+_last_flush = [0.0]
+
+
+def flush(force=False):
+    """多进程模式下把本进程的计数写入共享目录，默认每 METRICS_FLUSH_INTERVAL 秒最多写一次"""
+    directory = _multiproc_dir()
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush[0] < getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+        return
+    _last_flush[0] = now
+    histograms, counters = registry.collect()
+    data = {
+        'histograms': [[name, labels, item] for (name, labels), item in histograms.items()],
+        'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+    }
+    os.makedirs(directory, exist_ok=True)
+    path = _process_file(directory)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    # 原子替换，读取方不会读到写了一半的文件
+    os.replace(tmp_path, path)
+
+
+def collect_all():
+    """汇总所有进程的计数，未配置多进程目录时只返回本进程的计数"""
+    directory = _multiproc_dir()
+    if not directory:
+        return registry.collect()
+    flush(force=True)
+    histograms = {}
+    counters = {}
+    for path in glob.glob(os.path.join(directory, 'metrics_*.json')):
+        if _prune(path):
+            continue
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, item in data.get('histograms', []):
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.get(key)
+            if merged is None or len(merged) != len(item):
+                histograms[key] = list(item)
+            else:
+                for i, value in enumerate(item):
+                    merged[i] += value
+        for name, labels, value in data.get('counters', []):
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+    return histograms, counters
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(
+        key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for key, value in pairs)
+    return '{' + body + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    """按 Prometheus 文本格式输出所有指标"""
+    histograms, counters = collect_all()
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        series = sorted((labels, item) for (metric, labels), item in histograms.items() if metric == name)
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, item in series:
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], item[:-2]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, ("le", bound))} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(item[-2])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {item[-1]}')
+    for name, help_text in COUNTERS.items():
+        series = sorted((labels, value) for (metric, labels), value in counters.items() if metric == name)
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for labels, value in series:
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    /metrics 接口，只允许 METRICS_ALLOWED_IPS 中的地址访问，
+    配置了 METRICS_TOKEN 时其他地址带 Authorization: Bearer <token> 也可以访问
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+    authorized = bool(token) and request.META.get('HTTP_AUTHORIZATION') == f'Bearer {token}'
+    if not authorized and request.META.get('REMOTE_ADDR') not in allowed_ips:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class _QueryTimer:
+    """connection.execute_wrapper 回调，统计本次请求的查询次数和耗时"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """
+    记录每个路由的耗时、数据库耗时、查询次数、响应大小，路由取 django 的路由模板(如 api/system/post/<post_id>)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enable = getattr(settings, 'METRICS_ENABLE', True)
+
+    def __call__(self, request):
+        if not self.enable or request.path_info.rstrip('/') == '/metrics':
+            return self.get_response(request)
+        timer = _QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else 'unmatched'
+        labels = (('method', request.method), ('route', route))
+        registry.observe('fu_http_request_duration_seconds', labels, duration)
+        registry.observe('fu_http_request_db_seconds', labels, timer.duration)
+        registry.observe('fu_http_request_queries', labels, timer.count)
+        if not response.streaming:
+            registry.observe('fu_http_response_size_bytes', labels, len(response.content))
+        registry.inc('fu_http_requests_total', labels + (('status', response.status_code),))
+        flush()
+        return response
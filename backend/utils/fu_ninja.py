@@ -3,20 +3,32 @@
 # @Author  : 臧成龙
 # @FileName: fu_ninja.py
 # @Software: PyCharm
-from typing import Any, List
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional
 
-from django.db.models import QuerySet
+from django.db import connections
+from django.db.models import Q, QuerySet
 from django.http import HttpRequest, HttpResponse
 from ninja import Field, ModelSchema, NinjaAPI, Query, Router, Schema
+from ninja.errors import HttpError
 from ninja.orm.metaclass import ModelSchemaMetaclass
 from ninja.pagination import PaginationBase
 from ninja.types import DictStrAny
 
+from .fu_count import cached_count
+from .fu_renderer import FuJSONRenderer
 from .fu_response import FuResponse
 from .usual import get_user_info_from_token
 
 
 class FuNinjaAPI(NinjaAPI):
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        # 默认使用 orjson 渲染响应，未安装时退回标准库
+        kwargs.setdefault('renderer', FuJSONRenderer())
+        super().__init__(*args, **kwargs)
+
     def create_response(
             self, request: HttpRequest, data: Any, *, status: int = 200, code: int = 2000, msg: str = "success",
             temporal_response: HttpResponse = None,
@@ -32,7 +44,10 @@ class FuNinjaAPI(NinjaAPI):
             self.renderer.media_type, self.renderer.charset
         )
 
-        return HttpResponse(content, status=status, content_type=content_type)
+        response = HttpResponse(content, status=status, content_type=content_type)
+        # 结构化结果挂在响应上，日志中间件不需要再解析响应体
+        response.data = std_data
+        return response
 
 
 class MyPagination(PaginationBase):
@@ -59,6 +74,84 @@ class MyPagination(PaginationBase):
             "total": self._items_count(queryset),
         }  # noqa: E203
 
+    def _items_count(self, queryset: QuerySet) -> int:
+        # 相同条件的总数短时间缓存，大表无过滤条件时使用估算值
+        return cached_count(queryset)
+
+
+class CursorPagination(PaginationBase):
+    """
+    游标分页，按 (create_datetime, id) 倒序，使用上一页最后一行的值定位下一页，不使用 OFFSET，翻页深度不影响性能。
+    cursor 为上次返回的 next，不传时从第一页开始；next 为空表示没有更多数据，无效的 cursor 返回 400。
+    total 默认不统计，请求参数 withTotal=true 时才执行 count。
+    使用的模型需要 (-create_datetime, -id) 索引(见 OperationLog、LoginLog)，否则与 OFFSET 分页没有区别。
+    """
+
+    class Input(Schema):
+        pageSize: int = Field(10, gt=0, le=1000)
+        cursor: str = Field(None)
+        withTotal: bool = Field(False)
+
+    class Output(Schema):
+        items: List[Any]
+        next: Optional[str]
+        total: Optional[int]
+
+    @staticmethod
+    def encode_cursor(create_datetime, pk):
+        value = [create_datetime.isoformat() if create_datetime else None, pk]
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            value = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if not isinstance(value, list) or len(value) != 2:
+                raise ValueError(cursor)
+            create_datetime = datetime.fromisoformat(value[0]) if value[0] else None
+            return create_datetime, int(value[1])
+        except (ValueError, TypeError):
+            raise HttpError(400, '无效的分页游标')
+
+    def paginate_queryset(
+            self,
+            queryset: QuerySet,
+            pagination: Input,
+            **params: DictStrAny,
+    ) -> Any:
+        limit: int = pagination.pageSize
+        # 不指定空值位置，排序与 (-create_datetime, -id) 索引一致；
+        # create_datetime 可为空，倒序时 mysql、sqlite 空值在最后，postgresql 空值在最前
+        page = queryset.order_by('-create_datetime', '-id')
+        if pagination.cursor:
+            create_datetime, pk = self.decode_cursor(pagination.cursor)
+            nulls_last = connections[queryset.db].features.order_by_nulls_first
+            if create_datetime is None:
+                after = Q(create_datetime__isnull=True, id__lt=pk)
+                if not nulls_last:
+                    # 空值在最前时，空值之后是所有非空的行
+                    after |= Q(create_datetime__isnull=False)
+            else:
+                after = Q(create_datetime__lt=create_datetime) | Q(create_datetime=create_datetime, id__lt=pk)
+                if nulls_last:
+                    after |= Q(create_datetime__isnull=True)
+            page = page.filter(after)
+        # 多取一行判断是否还有下一页
+        items = list(page[:limit + 1])
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = self.encode_cursor(items[-1].create_datetime, items[-1].id)
+        return {
+            "limit": limit,
+            "items": items,
+            "next": next_cursor,
+            "total": self._items_count(queryset) if pagination.withTotal else None,
+        }
+
+    def _items_count(self, queryset: QuerySet) -> int:
+        return cached_count(queryset)
+
 
 class FuFilters(Schema):
     creator_id: int = Field(None, alias="creator_id")
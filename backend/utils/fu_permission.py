@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# @FileName: fu_permission.py
+# @Software: PyCharm
+import hashlib
+import re
+from functools import lru_cache
+
+from system.models import MenuButton, MenuColumnField, Role, Users
+
+from .fu_cache import LocalVersionCache
+
+METHOD = {
+    'GET': 0,
+    'POST': 1,
+    'PUT': 2,
+    'DELETE': 3,
+}
+
+# 单个权限索引最多缓存的判定结果数
+MAX_DECISIONS = 4096
+
+# 用户 -> 用户是否存在且未禁用
+active_user_cache = LocalVersionCache('active_user', maxsize=10000)
+# 用户 -> 角色id元组
+user_role_cache = LocalVersionCache('user_role', maxsize=10000)
+# 角色id元组 -> PermissionIndex
+permission_cache = LocalVersionCache('permission', maxsize=1024)
+# 角色id元组 -> DataScope
+data_scope_cache = LocalVersionCache('data_scope', maxsize=1024)
+# 角色id元组(超级管理员为 None) -> PermCodes
+perm_code_cache = LocalVersionCache('perm_code', maxsize=1024)
+
+
+@lru_cache(maxsize=2048)
+def _compile(request_path):
+    try:
+        return re.compile(request_path)
+    except re.error:
+        return None
+
+
+class PermissionIndex:
+    """
+    一组角色可访问的接口索引: {method: (api, ...)}
+    判定规则与原来的 MenuButton.objects.filter(api__regex=request_path) 一致，即以请求路径作为正则去匹配接口地址
+    """
+    __slots__ = ('apis', 'decisions')
+
+    def __init__(self, apis):
+        self.apis = apis
+        self.decisions = {}
+
+    def has_permission(self, method, request_path):
+        key = (method, request_path)
+        result = self.decisions.get(key)
+        if result is None:
+            pattern = _compile(request_path)
+            result = pattern is not None and any(pattern.search(api) for api in self.apis.get(method, ()))
+            if len(self.decisions) < MAX_DECISIONS:
+                self.decisions[key] = result
+        return result
+
+
+def is_active_user(user_id):
+    """
+    判断 token 中的用户是否仍然存在且未被禁用，用户保存或删除时失效
+    :param user_id: 用户id
+    :return: bool
+    """
+    return active_user_cache.get_or_set(user_id, lambda: Users.objects.filter(id=user_id, is_active=True).exists())
+
+
+def get_user_role_ids(user_id):
+    """
+    获取用户关联的角色id，按id排序后的元组，可直接作为缓存键
+    :param user_id: 用户id
+    :return:
+    """
+
+    def build():
+        role_ids = Users.role.through.objects.filter(users_id=user_id).values_list('role_id', flat=True)
+        return tuple(sorted(set(role_ids)))
+
+    return user_role_cache.get_or_set(user_id, build)
+
+
+def get_permission_index(role_ids):
+    """
+    获取角色组合的接口权限索引
+    :param role_ids: 排序后的角色id元组
+    :return: PermissionIndex
+    """
+
+    def build():
+        apis = {}
+        button_ids = Role.permission.through.objects.filter(role_id__in=role_ids).values('menubutton_id')
+        for method, api in MenuButton.objects.filter(id__in=button_ids).values_list('method', 'api'):
+            apis.setdefault(method, []).append(api)
+        return PermissionIndex({method: tuple(items) for method, items in apis.items()})
+
+    return permission_cache.get_or_set(role_ids, build)
+
+
+def has_api_permission(user_id, request_method, request_path):
+    """
+    判断用户是否拥有接口权限
+    :param user_id: 用户id
+    :param request_method: 请求方法 GET/POST/PUT/DELETE
+    :param request_path: 已将 /数字 结尾替换为 /* 的请求路径
+    :return: bool
+    """
+    method = METHOD.get(request_method)
+    if method is None:
+        return False
+    role_ids = get_user_role_ids(user_id)
+    if not role_ids:
+        return False
+    return get_permission_index(role_ids).has_permission(method, request_path)
+
+
+class DataScope:
+    """
+    一组角色合并后的数据权限: 取最大的 data_range，以及自定义数据权限关联的部门id
+    """
+    __slots__ = ('data_range', 'dept_ids')
+
+    def __init__(self, data_range, dept_ids):
+        self.data_range = data_range
+        self.dept_ids = dept_ids
+
+
+def get_data_scope(user_id):
+    """
+    获取用户的数据权限范围，按角色组合缓存，角色或用户角色变更时失效
+    :param user_id: 用户id
+    :return: DataScope
+    """
+    role_ids = get_user_role_ids(user_id)
+
+    def build():
+        data_range = 0
+        dept_ids = set()
+        for item_range, dept_id in Role.objects.filter(id__in=role_ids).values_list('data_range', 'dept__id'):
+            data_range = max(data_range, item_range)
+            if dept_id is not None:
+                dept_ids.add(dept_id)
+        return DataScope(data_range, frozenset(dept_ids))
+
+    return data_scope_cache.get_or_set(role_ids, build)
+
+
+class PermCodes:
+    """
+    一组角色拥有的按钮和列表权限标识，etag 由排序后的标识计算，内容不变时前端可以得到304
+    """
+    __slots__ = ('codes', 'etag')
+
+    def __init__(self, codes):
+        self.codes = codes
+        self.etag = hashlib.md5('\n'.join(sorted(codes)).encode()).hexdigest()
+
+
+def get_perm_codes(role_ids):
+    """
+    获取角色组合的权限标识
+    :param role_ids: 排序后的角色id元组，超级管理员传 None 表示全部权限
+    :return: PermCodes
+    """
+
+    def build():
+        button_codes = MenuButton.objects.all()
+        column_codes = MenuColumnField.objects.all()
+        if role_ids is not None:
+            button_ids = Role.permission.through.objects.filter(role_id__in=role_ids).values('menubutton_id')
+            column_ids = Role.column.through.objects.filter(role_id__in=role_ids).values('menucolumnfield_id')
+            button_codes = button_codes.filter(id__in=button_ids)
+            column_codes = column_codes.filter(id__in=column_ids)
+        codes = {*button_codes.values_list('code', flat=True), *column_codes.values_list('code', flat=True)}
+        return PermCodes(frozenset(codes))
+
+    return perm_code_cache.get_or_set(role_ids, build)
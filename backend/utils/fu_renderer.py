@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# @FileName: fu_renderer.py
+# @Software: PyCharm
+"""
+JSON 序列化
+
+FuResponse 与 FuNinjaAPI 共用的序列化入口，安装了 orjson 时使用 orjson，否则使用标准库 json。
+通过 JSON_RENDERER 配置选择实现: auto(默认)、orjson、json，或 register_json_backend 注册的其他实现。
+
+两种响应的日期格式与原来保持一致:
+- FuResponse: datetime 输出为 "%Y-%m-%d %H:%M:%S"
+- FuNinjaAPI: 与 ninja 默认的 NinjaJSONEncoder 相同(ISO 格式，精确到毫秒)
+"""
+import datetime
+import json
+
+from django.conf import settings
+from ninja.renderers import JSONRenderer
+from ninja.responses import NinjaJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+_ninja_encoder = NinjaJSONEncoder()
+
+
+def ninja_default(obj):
+    """date/time/Decimal/UUID/pydantic 模型等，与 NinjaJSONEncoder 相同"""
+    if type(obj) is datetime.datetime:
+        # 最常见的类型单独处理，格式同 DjangoJSONEncoder
+        value = obj.isoformat()
+        if obj.microsecond:
+            value = value[:23] + value[26:]
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return _ninja_encoder.default(obj)
+
+
+def fu_default(obj):
+    """datetime 沿用 DateEncoder 的格式，其余类型同 ninja_default"""
+    if isinstance(obj, datetime.datetime):
+        if obj.tzinfo is None and obj.year >= 1000:
+            # 与 strftime("%Y-%m-%d %H:%M:%S") 结果相同，速度快得多
+            return obj.isoformat(' ', 'seconds')
+        return obj.strftime("%Y-%m-%d %H:%M:%S")
+    return ninja_default(obj)
+
+
+def _json_dumps(obj, default):
+    return json.dumps(obj, default=default).encode()
+
+
+if orjson is not None:
+    # datetime 交给 default 处理以保持原有格式，int 字典键与标准库一样转换为字符串
+    _ORJSON_OPTION = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def _orjson_dumps(obj, default):
+        try:
+            return orjson.dumps(obj, default=default, option=_ORJSON_OPTION)
+        except TypeError:
+            # 超过 64 位的整数等 orjson 不支持的数据，退回标准库
+            return _json_dumps(obj, default)
+else:
+    _orjson_dumps = None
+
+JSON_BACKENDS = {
+    'json': _json_dumps,
+}
+if _orjson_dumps is not None:
+    JSON_BACKENDS['orjson'] = _orjson_dumps
+
+_backend = None
+
+
+def register_json_backend(name, dumps):
+    """
+    注册序列化实现
+    :param name: 名称，JSON_RENDERER 配置为该名称时使用
+    :param dumps: dumps(obj, default) -> bytes
+    """
+    global _backend
+    JSON_BACKENDS[name] = dumps
+    _backend = None
+
+
+def get_json_backend():
+    global _backend
+    if _backend is None:
+        name = getattr(settings, 'JSON_RENDERER', 'auto')
+        if name == 'auto':
+            name = 'orjson' if 'orjson' in JSON_BACKENDS else 'json'
+        _backend = JSON_BACKENDS.get(name, _json_dumps)
+    return _backend
+
+
+def dumps(obj, default=fu_default):
+    """
+    序列化为 JSON
+    :param obj: 需要序列化的数据
+    :param default: 非基础类型的转换函数，默认为 FuResponse 的格式
+    :return: bytes
+    """
+    return get_json_backend()(obj, default)
+
+
+class FuJSONRenderer(JSONRenderer):
+    """FuNinjaAPI 的响应渲染器"""
+
+    def render(self, request, data, *, response_status):
+        return dumps(data, default=ninja_default)
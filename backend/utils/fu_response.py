@@ -5,11 +5,9 @@
 # @Software: PyCharm
 # -*- coding: utf-8 -*-
 
-import json
-
 from django.http import HttpResponse
 
-from .fu_jwt import DateEncoder
+from .fu_renderer import dumps
 
 # class JsonResponse(HttpResponse):
 #
@@ -29,14 +27,29 @@ from .fu_jwt import DateEncoder
 # 		super().__init__(content=data, **kwargs)
 
 
+def render_content(data=None, msg='success', code=2000):
+	"""生成统一格式的响应体，可用于缓存预先序列化的结果"""
+	std_data = {
+		"code": code,
+		"result": data,
+		"message": msg,
+		"success": True
+	}
+	return dumps(std_data)
+
+
 class FuResponse(HttpResponse):
 
-	def __init__(self, data=None, msg='success', code=2000, *args, **kwargs):
-		std_data = {
+	def __init__(self, data=None, msg='success', code=2000, *args, content=None, **kwargs):
+		"""
+		:param content: 已经由 render_content 序列化好的响应体，传入时忽略 data
+		"""
+		if content is None:
+			content = render_content(data, msg, code)
+		super().__init__(content, *args, **kwargs)
+		# 结构化结果挂在响应上，日志中间件不需要再解析响应体
+		self.data = {
 			"code": code,
 			"result": data,
 			"message": msg,
-			"success": True
 		}
-		data = json.dumps(std_data, cls=DateEncoder)
-		super().__init__(data, *args, **kwargs)
@@ -0,0 +1,134 @@
+"""
+离线IP地址库
+
+从 csv 格式的IP段文件中加载数据，按起始地址排序后使用二分查找定位IP所在的段。
+文件第一行为表头，必须包含 start、end 两列(IP字符串或整数)，其余列与 LoginLog 的地区字段同名，例如:
+start,end,continent,country,province,city,district,isp,area_code,country_english,country_code,longitude,latitude
+"""
+import bisect
+import csv
+import ipaddress
+import logging
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LOCATION_FIELDS = (
+    "continent",
+    "country",
+    "province",
+    "city",
+    "district",
+    "isp",
+    "area_code",
+    "country_english",
+    "country_code",
+    "longitude",
+    "latitude",
+)
+
+
+def empty_location():
+    return {field: "" for field in LOCATION_FIELDS}
+
+
+def ip_to_int(value):
+    value = str(value).strip()
+    if value.isdigit():
+        return int(value)
+    return int(ipaddress.ip_address(value))
+
+
+class IpRangeDatabase:
+    """
+    IP段数据库: starts、ends 为排好序的段起止地址，records 为对应的地区信息
+    IPv4 与 IPv6 分开存放，避免整数范围重叠
+    """
+
+    def __init__(self):
+        self.tables = {4: ([], [], []), 6: ([], [], [])}
+
+    @classmethod
+    def load_csv(cls, path):
+        db = cls()
+        rows = {4: [], 6: []}
+        with open(path, newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                try:
+                    start = ip_to_int(row['start'])
+                    end = ip_to_int(row['end'])
+                except (KeyError, ValueError):
+                    continue
+                version = 6 if ':' in row['start'] or start > 0xFFFFFFFF else 4
+                record = tuple(row.get(field) or "" for field in LOCATION_FIELDS)
+                rows[version].append((start, end, record))
+        for version, items in rows.items():
+            items.sort(key=lambda item: item[0])
+            starts, ends, records = db.tables[version]
+            for start, end, record in items:
+                starts.append(start)
+                ends.append(end)
+                records.append(record)
+        return db
+
+    def __len__(self):
+        return sum(len(table[0]) for table in self.tables.values())
+
+    def lookup(self, ip):
+        """
+        查找IP所在的段
+        :param ip: IP字符串
+        :return: 地区信息 dict，找不到返回 None
+        """
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        starts, ends, records = self.tables[address.version]
+        value = int(address)
+        index = bisect.bisect_right(starts, value) - 1
+        if index < 0 or value > ends[index]:
+            return None
+        return dict(zip(LOCATION_FIELDS, records[index]))
+
+
+_database = None
+_database_lock = threading.Lock()
+
+
+def get_ip_database():
+    """按 IP_LOCATION_DB 配置加载IP库，进程内只加载一次，未配置或加载失败时为空库"""
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                path = getattr(settings, 'IP_LOCATION_DB', None)
+                database = IpRangeDatabase()
+                if path:
+                    try:
+                        database = IpRangeDatabase.load_csv(path)
+                    except OSError:
+                        logger.exception(f'加载IP地址库失败: {path}')
+                _database = database
+    return _database
+
+
+@lru_cache(maxsize=4096)
+def _lookup(ip):
+    return get_ip_database().lookup(ip)
+
+
+def lookup_ip(ip):
+    """
+    查询IP的地区信息
+    :param ip: IP字符串
+    :return: 地区信息 dict，找不到返回 None
+    """
+    if not ip or ip == 'unknown':
+        return None
+    location = _lookup(ip)
+    # 返回副本，避免调用方修改缓存中的数据
+    return dict(location) if location is not None else None
@@ -5,28 +5,55 @@
 # @Software: PyCharm
 # @qq: 939589097
 
-def add_node(p, node):
-    # ⼦节点list
-    p["children"] = []
-    for n in node:
-        if n.get("parent_id") == p.get("id"):
-            p["children"].append(n)
-    # 递归⼦节点，查找⼦节点的节点
-    for t in p["children"]:
-        if not t.get("children"):
-            t["children"] = []
-        t["children"].append(add_node(t, node))
-    # 退出递归的条件
-    if len(p["children"]) == 0:
-        p.pop('children')
-        p["choice"] = 1
-        return
+def build_tree(data):
+    """
+    单次遍历构建树，时间复杂度 O(n)
+    父节点不在数据中的节点(孤儿节点)作为根节点；成环的节点从首个未访问的节点处断开，同样作为根节点
+    有子节点的节点 choice=0 并带 children，叶子节点 choice=1 且没有 children
+    :param data: 带 id、parent_id 的字典列表
+    :return: 根节点列表
+    """
+    ids = {d.get("id") for d in data}
+    # 父节点id -> 子节点list，保持原数据顺序
+    children_map = {}
+    roots = []
+    for d in data:
+        d["choice"] = 0
+        parent_id = d.get("parent_id")
+        if parent_id is None or parent_id not in ids:
+            roots.append(d)
+        else:
+            children_map.setdefault(parent_id, []).append(d)
+
+    visited = set()
+
+    def attach(start):
+        stack = [start]
+        visited.add(id(start))
+        while stack:
+            p = stack.pop()
+            children = [n for n in children_map.get(p.get("id"), ()) if id(n) not in visited]
+            p.pop("children", None)
+            if children:
+                p["children"] = children
+                for n in children:
+                    visited.add(id(n))
+                stack.extend(children)
+            else:
+                p["choice"] = 1
+
+    for p in roots:
+        attach(p)
+    # 剩余未访问的节点只可能在环上
+    for d in data:
+        if id(d) not in visited:
+            roots.append(d)
+            attach(d)
+    return roots
 
 
 def list_to_route(data):
-    root = []
-    node = []
-    # 初始化数据，获取根节点和其他子节点list
+    # 初始化数据，生成路由需要的meta
     for d in data:
         d['meta'] = {
             'title': d.pop('title'),
@@ -35,42 +62,8 @@ def list_to_route(data):
             'hideMenu': d.pop('hide_menu'),
             'icon': d.pop('icon')
         }
-
-        d["choice"] = 0
-        if d.get("parent_id") is None:
-            root.append(d)
-        else:
-            node.append(d)
-    # print("root----",root)
-    # print("node----",node)
-    # 查找子节点
-    for p in root:
-        add_node(p, node)
-    # 无子节点
-    if len(root) == 0:
-        return node
-
-    return root
+    return build_tree(data)
 
 
 def list_to_tree(data):
-    root = []
-    node = []
-    # 初始化数据，获取根节点和其他子节点list
-
-    for d in data:
-        d["choice"] = 0
-        if d.get("parent_id") is None:
-            root.append(d)
-        else:
-            node.append(d)
-    # print("root----",root)
-    # print("node----",node)
-    # 查找子节点
-    for p in root:
-        add_node(p, node)
-    # 无子节点
-    if len(root) == 0:
-        return node
-
-    return root
+    return build_tree(data)
@@ -0,0 +1,132 @@
+"""
+接口日志记录规则
+"""
+import re
+
+from django.conf import settings
+
+# 缓存的路径判定结果上限
+MAX_CACHED_PATHS = 4096
+
+
+class LogRule:
+    """
+    单条日志规则
+    path: 路径前缀；regex: 路径正则，二者选一
+    methods: 适用的请求方法，不填表示全部
+    exclude: 为 True 时完全不记录(包括出错的请求)
+    sample_rate: 采样率 0~1，未被采样的请求只有出错时才记录
+    max_body_size: 请求参数、返回信息最多记录的字符数
+    """
+    __slots__ = ('prefix', 'pattern', 'methods', 'exclude', 'sample_rate', 'max_body_size')
+
+    def __init__(self, path=None, regex=None, methods=None, exclude=False, sample_rate=None, max_body_size=None):
+        self.prefix = path
+        self.pattern = re.compile(regex) if regex else None
+        self.methods = {item.upper() for item in methods} if methods else None
+        self.exclude = exclude
+        self.sample_rate = sample_rate if sample_rate is not None else getattr(settings, 'API_LOG_SAMPLE_RATE', 1)
+        self.max_body_size = max_body_size if max_body_size is not None else getattr(
+            settings, 'API_LOG_MAX_BODY_SIZE', 2000)
+
+    def match(self, method, path):
+        if self.methods is not None and method not in self.methods:
+            return False
+        if self.prefix is not None:
+            return path.startswith(self.prefix)
+        if self.pattern is not None:
+            return self.pattern.search(path) is not None
+        return True
+
+
+class LogRuleMatcher:
+    """
+    按配置顺序匹配日志规则，第一条匹配的规则生效，都不匹配时使用默认规则
+    同一个(method, path)的结果会被缓存
+    """
+
+    def __init__(self, rules):
+        self.rules = [LogRule(**rule) for rule in rules]
+        self.default = LogRule()
+        self._cache = {}
+
+    def match(self, method, path):
+        key = (method, path)
+        rule = self._cache.get(key)
+        if rule is None:
+            rule = next((item for item in self.rules if item.match(method, path)), self.default)
+            if len(self._cache) < MAX_CACHED_PATHS:
+                self._cache[key] = rule
+        return rule
+
+
+class _Exhausted(Exception):
+    pass
+
+
+def _bounded_str(value, max_size):
+    """
+    与 str(value) 结果相同，但输出超过 max_size 个字符后立即停止，
+    很大的请求参数、返回数据不会被完整转换为字符串
+    """
+    parts = []
+    size = 0
+
+    def emit(text):
+        nonlocal size
+        parts.append(text)
+        size += len(text)
+        if size > max_size:
+            raise _Exhausted
+
+    def walk(item):
+        if isinstance(item, dict):
+            emit('{')
+            for i, (key, val) in enumerate(item.items()):
+                if i:
+                    emit(', ')
+                walk(key)
+                emit(': ')
+                walk(val)
+            emit('}')
+        elif isinstance(item, (list, tuple)):
+            is_list = isinstance(item, list)
+            emit('[' if is_list else '(')
+            for i, val in enumerate(item):
+                if i:
+                    emit(', ')
+                walk(val)
+            if not is_list and len(item) == 1:
+                emit(',')
+            emit(']' if is_list else ')')
+        elif isinstance(item, (str, bytes)):
+            # 只转换需要的部分，切片后超出的内容在最后截断
+            emit(repr(item[:max_size + 1]))
+        else:
+            emit(repr(item))
+
+    try:
+        if isinstance(value, (dict, list, tuple)):
+            walk(value)
+        else:
+            emit(str(value))
+    except _Exhausted:
+        pass
+    return ''.join(parts)
+
+
+def truncate(value, max_size):
+    """将日志内容转换为字符串，并截断到 max_size 个字符，超出部分不做转换"""
+    if value is None:
+        return value
+    if max_size is None:
+        return str(value)
+    if isinstance(value, str):
+        text = value[:max_size + 1]
+    elif isinstance(value, bytes):
+        text = str(value[:max_size + 1])
+    else:
+        text = _bounded_str(value, max_size)
+    if len(text) > max_size:
+        text = text[:max_size] + '...'
+    return text
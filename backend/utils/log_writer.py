@@ -0,0 +1,154 @@
+"""
+日志异步批量写入
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BatchLogWriter:
+    """
+    有界内存队列 + 后台线程，使用 bulk_create 批量写入日志，请求线程只做入队不阻塞。
+    队列满时丢弃新日志并计数(背压)，进程退出时把队列中剩余的日志写完。
+    传入 handler 时由 handler(batch) 处理每一批数据，代替 bulk_create。
+    """
+
+    def __init__(self, model, queue_size=10000, batch_size=200, flush_interval=1.0, handler=None):
+        self.model = model
+        self.handler = handler
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # gunicorn 等 fork 之后子进程中没有后台线程，需要重新启动
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self.queue = queue.Queue(maxsize=self.queue.maxsize)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f'{self.model.__name__}Writer', daemon=True)
+            self._thread.start()
+
+    def put(self, instance):
+        """
+        日志入队，队列已满时丢弃
+        :param instance: 未保存的模型实例，或交给 handler 处理的数据
+        :return: 是否入队成功
+        """
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(instance)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                self._write(batch)
+        # 退出前写完剩余日志
+        batch = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+        if batch:
+            self._write(batch)
+        connection.close()
+
+    def _write(self, batch):
+        close_old_connections()
+        try:
+            if self.handler is not None:
+                self.handler(batch)
+            else:
+                self.model.objects.bulk_create(batch, batch_size=self.batch_size)
+            self.written += len(batch)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception(f'批量写入{self.model._meta.verbose_name}失败，丢弃{len(batch)}条')
+
+    def stop(self, timeout=5):
+        """停止后台线程并写完队列中的日志"""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+
+    def stats(self):
+        return {
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'pending': self.queue.qsize(),
+        }
+
+
+_writers = {}
+
+
+def get_log_writer(model, handler=None):
+    """获取模型对应的日志写入器，同一模型在进程内只有一个，handler 只在首次创建时生效"""
+    writer = _writers.get(model)
+    if writer is None:
+        writer = BatchLogWriter(
+            model,
+            queue_size=getattr(settings, 'API_LOG_QUEUE_SIZE', 10000),
+            batch_size=getattr(settings, 'API_LOG_BATCH_SIZE', 200),
+            flush_interval=getattr(settings, 'API_LOG_FLUSH_INTERVAL', 1.0),
+            handler=handler,
+        )
+        writer = _writers.setdefault(model, writer)
+    return writer
+
+
+@atexit.register
+def _flush_all():
+    for writer in list(_writers.values()):
+        writer.stop()
@@ -1,13 +1,15 @@
 """
 日志 django中间件
 """
-import json
+import random
 
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.utils.deprecation import MiddlewareMixin
 from system.models import OperationLog, Users
 
+from .log_rules import LogRuleMatcher, truncate
+from .log_writer import get_log_writer
 from .request_util import (
     get_browser,
     get_os,
@@ -28,7 +30,8 @@ class ApiLoggingMiddleware(MiddlewareMixin):
         super().__init__(get_response)
         self.enable = getattr(settings, 'API_LOG_ENABLE', None) or False
         self.methods = getattr(settings, 'API_LOG_METHODS', None) or set()
-        self.operation_log_id = None
+        self.async_write = getattr(settings, 'API_LOG_ASYNC', True)
+        self.rules = LogRuleMatcher(getattr(settings, 'API_LOG_RULES', None) or [])
 
     @classmethod
     def __handle_request(cls, request):
@@ -36,19 +39,23 @@ class ApiLoggingMiddleware(MiddlewareMixin):
         request.request_data = get_request_data(request)
         request.request_path = get_request_path(request)
 
-    def __handle_response(self, request, response):
+    def __handle_response(self, request, response, rule, sampled):
+        # 流式、文件响应不记录
+        if response.streaming:
+            return
         # request_data,request_ip由PermissionInterfaceMiddleware中间件中添加的属性
         body = getattr(request, 'request_data', {})
         # 请求含有password则用*替换掉(暂时先用于所有接口的password请求参数)
         if isinstance(body, dict) and body.get('password', ''):
             body['password'] = '*' * len(body['password'])
-        if not hasattr(response, 'data') or not isinstance(response.data, dict):
-            response.data = {}
-        try:
-            if not response.data and response.content:
-                content = json.loads(response.content.decode())
-                response.data = content if isinstance(content, dict) else {}
-        except Exception:
+        # FuResponse、FuNinjaAPI.create_response 会在响应上挂载 data，不再解析响应体
+        data = getattr(response, 'data', None)
+        if not isinstance(data, dict):
+            data = {}
+        code = data.get('code')
+        # 未被采样的请求只记录出错的
+        is_error = response.status_code >= 400 or (code is not None and code != 2000)
+        if not sampled and not is_error:
             return
         user = get_request_user(request)
         if isinstance(user, AnonymousUser):
@@ -60,27 +67,27 @@ class ApiLoggingMiddleware(MiddlewareMixin):
             'belong_dept': user.dept_id if isinstance(user, Users) else user['dept'],
             'request_method': request.method,
             'request_path': request.request_path,
-            'request_body': body,
-            'response_code': response.data.get('code'),
+            'request_body': truncate(body, rule.max_body_size),
+            'response_code': code,
             'request_os': get_os(request),
             'request_browser': get_browser(request),
             'request_msg': request.session.get('request_msg'),
-            'status': True if response.data.get('code') in [2000, ] else False,
-            'json_result': {"code": response.data.get('code'), "msg": response.data.get('result')},
+            'status': True if code in [2000, ] else False,
+            'json_result': truncate({"code": code, "msg": data.get('result')}, rule.max_body_size),
         }
-        operation_log, creat = OperationLog.objects.update_or_create(defaults=info, id=self.operation_log_id)
+        operation_log = OperationLog(request_modular=getattr(request, 'request_modular', None), **info)
         if not operation_log.request_modular and settings.API_MODEL_MAP.get(request.request_path, None):
             operation_log.request_modular = settings.API_MODEL_MAP[request.request_path]
+        if self.async_write:
+            # 入队后由后台线程批量写入，不阻塞请求
+            get_log_writer(OperationLog).put(operation_log)
+        else:
             operation_log.save()
 
     def process_view(self, request, view_func, view_args, view_kwargs):
+        # 模块名记录在当前请求上，避免多线程共用中间件实例时互相覆盖
         if hasattr(view_func, 'cls') and hasattr(view_func.cls, 'queryset'):
-            if self.enable:
-                if self.methods == 'ALL' or request.method in self.methods:
-                    log = OperationLog(request_modular=get_verbose_name(view_func.cls.queryset))
-                    log.save()
-                    self.operation_log_id = log.id
-
+            request.request_modular = get_verbose_name(view_func.cls.queryset)
         return
 
     def process_request(self, request):
@@ -95,5 +102,8 @@ class ApiLoggingMiddleware(MiddlewareMixin):
         """
         if self.enable:
             if self.methods == 'ALL' or request.method in self.methods:
-                self.__handle_response(request, response)
+                rule = self.rules.match(request.method, request.path)
+                if not rule.exclude:
+                    sampled = rule.sample_rate >= 1 or random.random() < rule.sample_rate
+                    self.__handle_response(request, response, rule, sampled)
         return response
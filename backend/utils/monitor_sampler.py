@@ -0,0 +1,220 @@
+"""
+服务器监控后台采样
+
+第一次请求监控接口时才启动后台线程，每隔 MONITOR_SAMPLE_INTERVAL 秒采集一次 CPU、内存、磁盘、网络、负载信息，
+最新一次的完整数据直接返回给监控接口，数值指标写入多精度时序存储(见 utils.timeseries)用于绘制趋势图。
+超过 MONITOR_IDLE_TIMEOUT 秒没有请求时线程退出，不在无人查看时持续采样；每个 web 进程各有一个采样线程。
+网络、磁盘IO速率由采样线程根据上一次的计数器计算，不再依赖缓存中的上次计数。
+"""
+import logging
+import os
+import threading
+import time
+
+import psutil
+from django.conf import settings
+
+from .system import system
+from .timeseries import DEFAULT_TIERS, TimeSeriesStore
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('cpu', 'mem', 'load', 'up', 'down', 'disk_read', 'disk_write')
+
+DISK_FIELDS = ('read_count', 'write_count', 'read_bytes', 'write_bytes', 'read_time', 'write_time',
+               'read_merged_count', 'write_merged_count')
+
+
+def to_point(snapshot):
+    """从完整的监控数据中取出绘图需要的数值"""
+    network = snapshot.get('network') or {}
+    iostat = (network.get('iostat') or {}).get('ALL') or {}
+    cpu = snapshot.get('cpu') or ()
+    return {
+        'cpu': cpu[0] if cpu else 0,
+        'mem': (snapshot.get('mem') or {}).get('percent', 0),
+        'load': (snapshot.get('load_average') or {}).get('one', 0),
+        'up': network.get('up', 0),
+        'down': network.get('down', 0),
+        'disk_read': iostat.get('read_bytes', 0),
+        'disk_write': iostat.get('write_bytes', 0),
+    }
+
+
+class IoRates:
+    """根据两次采样之间的计数器差值计算网卡、磁盘的每秒速率，返回格式与 GetNetWork 相同"""
+
+    def __init__(self):
+        self._time = None
+        self._net = {}
+        self._disk = {}
+
+    def sample(self):
+        now = time.monotonic()
+        net = psutil.net_io_counters(pernic=True) or {}
+        try:
+            disk = psutil.disk_io_counters(perdisk=True) or {}
+        except Exception:
+            disk = {}
+        elapsed = (now - self._time) if self._time else 0
+        elapsed = elapsed or 1
+
+        info = {'network': {}, 'upTotal': 0, 'downTotal': 0, 'up': 0, 'down': 0, 'downPackets': 0, 'upPackets': 0}
+        for name, counter in net.items():
+            last = self._net.get(name, counter)
+            item = {
+                'upTotal': counter.bytes_sent,
+                'downTotal': counter.bytes_recv,
+                'up': round(max(counter.bytes_sent - last.bytes_sent, 0) / 1024 / elapsed, 2),
+                'down': round(max(counter.bytes_recv - last.bytes_recv, 0) / 1024 / elapsed, 2),
+                'downPackets': counter.packets_recv,
+                'upPackets': counter.packets_sent,
+            }
+            info['network'][name] = item
+            for key in ('upTotal', 'downTotal', 'up', 'down', 'downPackets', 'upPackets'):
+                info[key] += item[key]
+        info['up'] = round(float(info['up']), 2)
+        info['down'] = round(float(info['down']), 2)
+
+        iostat = {'ALL': dict.fromkeys(DISK_FIELDS, 0)}
+        for name, counter in disk.items():
+            last = self._disk.get(name, counter)
+            item = {field: int(max(getattr(counter, field, 0) - getattr(last, field, 0), 0) / elapsed)
+                    for field in DISK_FIELDS}
+            iostat[name] = item
+            for field in DISK_FIELDS:
+                if field in ('read_time', 'write_time'):
+                    iostat['ALL'][field] = max(iostat['ALL'][field], item[field])
+                else:
+                    iostat['ALL'][field] += item[field]
+        info['iostat'] = iostat
+
+        self._time = now
+        self._net = net
+        self._disk = disk
+        return info
+
+
+class MonitorSampler:
+    """
+    后台采样线程 + 时序存储，接口只读取内存中的数据，不再阻塞请求线程
+    """
+
+    def __init__(self, interval=5, history_size=120, tiers=DEFAULT_TIERS, idle_timeout=300):
+        self.interval = interval
+        self.history_size = history_size
+        self.tiers = tiers
+        self.idle_timeout = idle_timeout
+        self._last_access = time.monotonic()
+        self.store = TimeSeriesStore(METRICS, tiers)
+        self.io_rates = IoRates()
+        self.latest = None
+        self._ready = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # 先记录访问时间，采样线程据此判断是否空闲
+        self._last_access = time.monotonic()
+        # gunicorn 等 fork 之后子进程中没有后台线程，需要重新启动
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid() and thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self.store = TimeSeriesStore(METRICS, self.tiers)
+                self.io_rates = IoRates()
+            # 空闲退出后重新启动时，之前的最新数据已过期
+            self.latest = None
+            self._ready.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='MonitorSampler', daemon=True)
+            self._thread.start()
+
+    def sample(self):
+        """采集一次，CPU使用率和IO速率为距上次采集以来的平均值"""
+        info = system()
+        snapshot = {
+            'mem': info.GetMemInfo(),
+            'load_average': info.GetLoadAverage(),
+            'network': self.io_rates.sample(),
+            'cpu': info.GetCpuInfo(None),
+            'disk': info.GetDiskInfo(),
+            'time': info.GetBootTime(),
+            'system': info.GetSystemVersion(),
+            'is_windows': info.isWindows,
+            'sampled_at': int(time.time()),
+        }
+        self.latest = snapshot
+        self.store.add(snapshot['sampled_at'], to_point(snapshot))
+        self._ready.set()
+        return snapshot
+
+    def _run(self):
+        # 第一次调用 cpu_percent(None) 和 IO 计数没有参照值，先取一次再等待一小段时间
+        psutil.cpu_percent(None)
+        self.io_rates.sample()
+        time.sleep(min(self.interval, 0.5))
+        while True:
+            started = time.monotonic()
+            with self._lock:
+                if started - self._last_access > self.idle_timeout:
+                    # 长时间没有请求，退出线程，下次请求时重新启动
+                    self._thread = None
+                    return
+            try:
+                self.sample()
+            except Exception:
+                logger.exception('服务器监控采样失败')
+            time.sleep(max(self.interval - (time.monotonic() - started), 0.1))
+
+    def snapshot(self, timeout=2):
+        """
+        获取最新的监控数据
+        :param timeout: 还没有采样结果时最多等待的秒数
+        :return: 监控数据，超时仍没有结果时返回 None
+        """
+        self.ensure_started()
+        if self.latest is None:
+            self._ready.wait(timeout)
+        return self.latest
+
+    def get_history(self, since=None):
+        """
+        获取最精细一层中最近 history_size 个数据点
+        :param since: 只返回该时间戳之后的数据点
+        :return: [{"time": 时间戳, 指标: 平均值, ...}]
+        """
+        series = self.store.query(time.time(), since=since)
+        points = [
+            dict({'time': timestamp}, **{metric: values[i] for metric, values in series['avg'].items()})
+            for i, timestamp in enumerate(series['time'])
+        ]
+        return points[-self.history_size:]
+
+    def query(self, resolution=None, since=None, metrics=None):
+        """按精度查询历史数据，见 TimeSeriesStore.query"""
+        self.ensure_started()
+        return self.store.query(time.time(), resolution, since, metrics)
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    """进程内唯一的采样器，首次调用监控接口时才启动采样线程"""
+    global _sampler
+    if _sampler is None:
+        with _sampler_lock:
+            if _sampler is None:
+                _sampler = MonitorSampler(
+                    interval=getattr(settings, 'MONITOR_SAMPLE_INTERVAL', 5),
+                    history_size=getattr(settings, 'MONITOR_HISTORY_SIZE', 120),
+                    tiers=getattr(settings, 'MONITOR_TIERS', DEFAULT_TIERS),
+                    idle_timeout=getattr(settings, 'MONITOR_IDLE_TIMEOUT', 300),
+                )
+    return _sampler
@@ -0,0 +1,133 @@
+"""
+请求内数据库查询检查(开发、CI 环境使用)
+
+统计每个请求执行的查询，把 sql 中的参数替换为占位符得到"查询形状"，同一形状重复执行多次视为 N+1 查询；
+并按路由检查查询次数是否超过 QUERY_BUDGETS 中配置的上限。
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack
+from fnmatch import fnmatchcase
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """把 sql 中的字符串、数字、参数占位符、IN 列表统一替换为 ?，得到查询形状"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST_RE.sub('IN (?)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class QueryCapture:
+    """
+    上下文管理器，记录期间所有数据库连接执行的 sql
+    with QueryCapture() as capture:
+        ...
+    capture.count / capture.repeated()
+    """
+
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def repeated(self, threshold=None):
+        """
+        重复执行的查询形状
+        :param threshold: 同一形状执行次数达到该值才算，默认 QUERY_N_PLUS_ONE_THRESHOLD
+        :return: [(查询形状, 次数)]，按次数从多到少
+        """
+        threshold = threshold or getattr(settings, 'QUERY_N_PLUS_ONE_THRESHOLD', 5)
+        shapes = Counter(normalize_sql(sql) for sql in self.queries)
+        return [(shape, count) for shape, count in shapes.most_common() if count >= threshold]
+
+
+def get_query_budget(route):
+    """
+    路由的查询次数上限，QUERY_BUDGETS 的键为路由模板或通配符(如 api/system/role/*)，都不匹配时为 QUERY_BUDGET_DEFAULT
+    """
+    budgets = getattr(settings, 'QUERY_BUDGETS', None) or {}
+    if route in budgets:
+        return budgets[route]
+    for pattern, budget in budgets.items():
+        if fnmatchcase(route, pattern):
+            return budget
+    return getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+
+
+def check_queries(method, route, capture):
+    """
+    检查一次请求的查询
+    :return: {"method", "route", "count", "budget", "over_budget", "n_plus_one": [(查询形状, 次数)]}
+    """
+    budget = get_query_budget(route)
+    return {
+        'method': method,
+        'route': route,
+        'count': capture.count,
+        'budget': budget,
+        'over_budget': budget is not None and capture.count > budget,
+        'n_plus_one': capture.repeated(),
+    }
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryInspectorMiddleware:
+    """
+    QUERY_INSPECTOR_ENABLE 为 True 时检查每个请求的查询，发现 N+1 或超出上限时记录警告，
+    响应头 X-Query-Count 为本次请求的查询次数；QUERY_INSPECTOR_RAISE 为 True 时(CI)超出上限直接抛出异常
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enable = getattr(settings, 'QUERY_INSPECTOR_ENABLE', False)
+        self.raise_error = getattr(settings, 'QUERY_INSPECTOR_RAISE', False)
+
+    def __call__(self, request):
+        if not self.enable:
+            return self.get_response(request)
+        with QueryCapture() as capture:
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else request.path_info
+        result = check_queries(request.method, route, capture)
+        response['X-Query-Count'] = str(result['count'])
+        for shape, count in result['n_plus_one']:
+            logger.warning(f'疑似 N+1 查询 {request.method} {route}: 执行 {count} 次 {shape[:300]}')
+        if result['over_budget']:
+            message = f'{request.method} {route} 执行了 {result["count"]} 次查询，超过上限 {result["budget"]}'
+            if self.raise_error:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -2,6 +2,8 @@
 Request工具类
 """
 import json
+import logging
+from functools import lru_cache
 
 import requests
 from django.conf import settings
@@ -10,8 +12,12 @@ from django.urls.resolvers import ResolverMatch
 from system.models import LoginLog
 from user_agents import parse
 
+from .ip_location import LOCATION_FIELDS, empty_location, lookup_ip
+from .log_writer import get_log_writer
 from .usual import get_user_info_from_token
 
+logger = logging.getLogger(__name__)
+
 
 def get_request_user(request):
     """
@@ -119,6 +125,29 @@ def get_request_canonical_path(request, ):
     return path
 
 
+@lru_cache(maxsize=1024)
+def parse_user_agent(ua_string):
+    """
+    解析 user agent，不同的 user agent 数量很少，按字符串缓存解析结果
+    :param ua_string:
+    :return:
+    """
+    return parse(ua_string)
+
+
+def get_user_agent(request):
+    """
+    获取请求的 user agent 解析结果，同一个请求只解析一次
+    :param request:
+    :return:
+    """
+    user_agent = getattr(request, '_user_agent', None)
+    if user_agent is None:
+        user_agent = parse_user_agent(request.META.get('HTTP_USER_AGENT', ''))
+        request._user_agent = user_agent
+    return user_agent
+
+
 def get_browser(request, ):
     """
     获取浏览器名
@@ -127,9 +156,7 @@ def get_browser(request, ):
     :param kwargs:
     :return:
     """
-    ua_string = request.META['HTTP_USER_AGENT']
-    user_agent = parse(ua_string)
-    return user_agent.get_browser()
+    return get_user_agent(request).get_browser()
 
 
 def get_os(request, ):
@@ -140,9 +167,7 @@ def get_os(request, ):
     :param kwargs:
     :return:
     """
-    ua_string = request.META['HTTP_USER_AGENT']
-    user_agent = parse(ua_string)
-    return user_agent.get_os()
+    return get_user_agent(request).get_os()
 
 
 def get_verbose_name(queryset=None, view=None, model=None):
@@ -170,47 +195,99 @@ def get_verbose_name(queryset=None, view=None, model=None):
 
 def get_ip_analysis(ip):
     """
-    获取ip详细概略
+    获取ip详细概略，只查询本地IP地址库，不会发起网络请求
     :param ip: ip地址
     :return:
     """
-    data = {
-        "continent": "",
-        "country": "",
-        "province": "",
-        "city": "",
-        "district": "",
-        "isp": "",
-        "area_code": "",
-        "country_english": "",
-        "country_code": "",
-        "longitude": "",
-        "latitude": ""
-    }
+    data = empty_location()
     if ip != 'unknown' and ip:
         if getattr(settings, 'ENABLE_LOGIN_ANALYSIS_LOG', True):
-            res = requests.get(url='https://ip.django-vue-admin.com/ip/analysis', params={"ip": ip}, verify=False)
-
-            if res.status_code == 200:
-                res_data = res.json()
-                if res_data.get('code') == 0:
-                    data = res_data.get('data')
-            return data
+            location = lookup_ip(ip)
+            if location:
+                data.update(location)
     return data
 
 
+def fetch_ip_analysis(ip):
+    """
+    通过在线接口获取ip详细概略，会阻塞，只在请求之外调用
+    :param ip: ip地址
+    :return: 地区信息，获取失败返回 None
+    """
+    res = requests.get(url='https://ip.django-vue-admin.com/ip/analysis', params={"ip": ip}, verify=False,
+                       timeout=getattr(settings, 'IP_ANALYSIS_HTTP_TIMEOUT', 3))
+    if res.status_code == 200:
+        res_data = res.json()
+        if res_data.get('code') == 0:
+            data = res_data.get('data') or {}
+            return {field: data.get(field, '') for field in LOCATION_FIELDS}
+    return None
+
+
+def build_login_logs(entries):
+    """
+    补充登录日志的地区、浏览器、操作系统信息
+    :param entries: save_login_log 收集的原始数据列表
+    :return: 未保存的 LoginLog 列表
+    """
+    http_enable = getattr(settings, 'IP_ANALYSIS_HTTP', False)
+    http_results = {}
+    login_logs = []
+    for entry in entries:
+        ip = entry['ip']
+        analysis_data = get_ip_analysis(ip)
+        # 本地IP库未命中时按配置通过在线接口补充，同一批中相同ip只请求一次
+        if http_enable and not any(analysis_data.values()) and ip != 'unknown' and ip \
+                and getattr(settings, 'ENABLE_LOGIN_ANALYSIS_LOG', True):
+            if ip not in http_results:
+                try:
+                    http_results[ip] = fetch_ip_analysis(ip)
+                except Exception:
+                    logger.exception(f'获取ip详细概略失败: {ip}')
+                    http_results[ip] = None
+            analysis_data.update(http_results[ip] or {})
+        user_agent = parse_user_agent(entry['agent'])
+        analysis_data['username'] = entry['username']
+        analysis_data['ip'] = ip
+        analysis_data['agent'] = str(user_agent)
+        analysis_data['browser'] = user_agent.get_browser()
+        analysis_data['os'] = user_agent.get_os()
+        analysis_data['creator_id'] = entry['creator_id']
+        analysis_data['belong_dept'] = entry['belong_dept']
+        login_logs.append(LoginLog(**analysis_data))
+    return login_logs
+
+
+def write_login_logs(entries):
+    """批量补充并写入登录日志，在日志后台线程中调用，LOGIN_LOG_ASYNC 为 True 时由 celery worker 调用"""
+    LoginLog.objects.bulk_create(build_login_logs(entries))
+
+
+def dispatch_login_logs(entries):
+    """
+    写入一批登录日志，默认在日志后台线程中直接写入；
+    LOGIN_LOG_ASYNC 为 True 时交给 celery worker 处理(需要运行 worker)，投递失败时直接写入
+    """
+    if getattr(settings, 'LOGIN_LOG_ASYNC', False):
+        from system.tasks import save_login_logs
+        try:
+            save_login_logs.apply_async((entries,), retry=False)
+            return
+        except Exception:
+            logger.exception('登录日志投递到 celery 失败，直接写入')
+    write_login_logs(entries)
+
+
 def save_login_log(request):
     """
-    保存登录日志
+    保存登录日志，只收集请求中的原始数据，地区解析和写库在请求之外分批完成
     :return:
     """
-    ip = get_request_ip(request=request)
-    analysis_data = get_ip_analysis(ip)
-    analysis_data['username'] = request.user.username
-    analysis_data['ip'] = ip
-    analysis_data['agent'] = str(parse(request.META['HTTP_USER_AGENT']))
-    analysis_data['browser'] = get_browser(request)
-    analysis_data['os'] = get_os(request)
-    analysis_data['creator_id'] = request.user.id
-    analysis_data['belong_dept'] = getattr(request.user, 'dept_id', '')
-    LoginLog.objects.create(**analysis_data)
+    entry = {
+        'ip': get_request_ip(request=request),
+        'agent': request.META.get('HTTP_USER_AGENT', ''),
+        'username': request.user.username,
+        'creator_id': request.user.id,
+        'belong_dept': getattr(request.user, 'dept_id', None),
+    }
+    get_log_writer(LoginLog, handler=dispatch_login_logs).put(entry)
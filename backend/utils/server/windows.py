@@ -685,13 +685,17 @@ def GetCpuInfo(interval=1):
     cpuCount = psutil.cpu_count()
     cpuNum = psutil.cpu_count(logical=False)
 
-    import threading
-    p = threading.Thread(target=get_cpu_percent_thead, args=(interval,))
-    # p.setDaemon(True)
-    p.start()
-
-    used = cache.get('lybbn_cpu_used_all')
-    if not used: used = get_cpu_percent_thead(interval)
+    if interval:
+        import threading
+        p = threading.Thread(target=get_cpu_percent_thead, args=(interval,))
+        # p.setDaemon(True)
+        p.start()
+
+        used = cache.get('lybbn_cpu_used_all')
+        if not used: used = get_cpu_percent_thead(interval)
+    else:
+        # 不阻塞: 返回距上次调用以来的CPU使用率，供后台采样线程定期调用
+        used = psutil.cpu_percent(None)
 
     used_all = psutil.cpu_percent(percpu=True)
 
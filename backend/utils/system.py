@@ -34,15 +34,16 @@ class system:
             return True
         return False
 
-    def GetSystemAllInfo(self,isCache=False):
+    def GetSystemAllInfo(self,isCache=False,interval=1):
         """
         获取系统所有信息
+        interval: CPU使用率的采样时间(秒)，为 None 时不阻塞，取距上次调用以来的使用率
         """
         data = {}
         data['mem'] = self.GetMemInfo()
         data['load_average'] = self.GetLoadAverage()
         data['network'] = self.GetNetWork()
-        data['cpu'] = self.GetCpuInfo(1)
+        data['cpu'] = self.GetCpuInfo(interval)
         data['disk'] = self.GetDiskInfo()
         data['time'] = self.GetBootTime()
         data['system'] = self.GetSystemVersion()
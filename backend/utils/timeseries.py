@@ -0,0 +1,101 @@
+"""
+固定大小的内存时序存储
+
+每个精度(如 1秒/1分钟/1小时)一层，每层为固定长度的环形数组，每个指标保存时间桶内的和、最大值与采样次数。
+写入时同时累加到所有层，查询时按层取平均值和最大值，内存占用与运行时间无关。
+"""
+import threading
+from array import array
+
+# 默认的精度层级: (精度秒数, 保留的桶数) -> 1小时的5秒级、24小时的分钟级、30天的小时级
+DEFAULT_TIERS = ((5, 720), (60, 1440), (3600, 720))
+
+
+class Tier:
+    """单个精度层，第 n 个时间桶存放在 n % size 的位置"""
+
+    def __init__(self, resolution, size, metrics):
+        self.resolution = resolution
+        self.size = size
+        self.times = array('q', [-1]) * size
+        self.counts = array('l', [0]) * size
+        self.sums = {metric: array('d', [0.0]) * size for metric in metrics}
+        self.maxs = {metric: array('d', [0.0]) * size for metric in metrics}
+
+    def add(self, timestamp, values):
+        bucket = int(timestamp) // self.resolution
+        index = bucket % self.size
+        start = bucket * self.resolution
+        if self.times[index] != start:
+            # 环形数组转了一圈，覆盖旧的时间桶
+            self.times[index] = start
+            self.counts[index] = 0
+            for metric in self.sums:
+                self.sums[metric][index] = 0.0
+                self.maxs[metric][index] = float('-inf')
+        self.counts[index] += 1
+        for metric, value in values.items():
+            if metric in self.sums:
+                value = float(value or 0)
+                self.sums[metric][index] += value
+                if value > self.maxs[metric][index]:
+                    self.maxs[metric][index] = value
+
+    def query(self, now, since=None, metrics=None):
+        oldest = (int(now) // self.resolution - self.size + 1) * self.resolution
+        if since is not None:
+            oldest = max(oldest, since + 1)
+        metrics = [metric for metric in (metrics or self.sums) if metric in self.sums]
+        indexes = sorted((i for i in range(self.size) if self.times[i] >= oldest and self.counts[i]),
+                         key=lambda i: self.times[i])
+        return {
+            'resolution': self.resolution,
+            'time': [self.times[i] for i in indexes],
+            'avg': {metric: [round(self.sums[metric][i] / self.counts[i], 2) for i in indexes] for metric in metrics},
+            'max': {metric: [round(self.maxs[metric][i], 2) for i in indexes] for metric in metrics},
+        }
+
+
+class TimeSeriesStore:
+    """
+    多精度时序存储
+    metrics: 指标名列表
+    tiers: ((精度秒数, 保留的桶数), ...)
+    """
+
+    def __init__(self, metrics, tiers=DEFAULT_TIERS):
+        self.metrics = tuple(metrics)
+        self.tiers = [Tier(resolution, size, self.metrics) for resolution, size in sorted(tiers)]
+        self._lock = threading.Lock()
+
+    @property
+    def resolutions(self):
+        return [tier.resolution for tier in self.tiers]
+
+    def add(self, timestamp, values):
+        """
+        写入一个采样点
+        :param timestamp: 时间戳(秒)
+        :param values: {指标名: 数值}
+        """
+        with self._lock:
+            for tier in self.tiers:
+                tier.add(timestamp, values)
+
+    def get_tier(self, resolution):
+        """取精度不低于 resolution 的最粗一层，没有时取最精细的一层"""
+        candidates = [tier for tier in self.tiers if tier.resolution <= resolution]
+        return candidates[-1] if candidates else self.tiers[0]
+
+    def query(self, now, resolution=None, since=None, metrics=None):
+        """
+        查询历史数据
+        :param now: 当前时间戳
+        :param resolution: 需要的精度(秒)，不传时使用最精细的一层
+        :param since: 只返回该时间戳之后的时间桶
+        :param metrics: 需要的指标名，不传时返回全部
+        :return: {"resolution": 精度, "time": [时间桶起点], "avg": {指标: [...]}, "max": {指标: [...]}}
+        """
+        tier = self.get_tier(resolution) if resolution else self.tiers[0]
+        with self._lock:
+            return tier.query(now, since, metrics)
@@ -8,35 +8,75 @@
 from fuadmin.settings import SECRET_KEY
 from system.models import Dept
 
-from .fu_jwt import FuJwt
+from .fu_cache import LocalVersionCache
+from .fu_jwt import decode
+
+
+def get_request_jwt(request, token=None):
+    """
+    获取请求中已解码的token，同一个请求只验签一次
+    :param request: 请求对象
+    :param token: 已从请求头中取出的token，不传则从 HTTP_AUTHORIZATION 中获取
+    :return: Jwt
+    """
+    if token is None:
+        token = request.META.get("HTTP_AUTHORIZATION")
+        token = token.split(" ")[1]
+    cached = getattr(request, '_fu_jwt', None)
+    if cached is not None and cached[0] == token:
+        return cached[1]
+    jwt = decode(SECRET_KEY, token)
+    request._fu_jwt = (token, jwt)
+    return jwt
 
 
 def get_user_info_from_token(request):
-    token = request.META.get("HTTP_AUTHORIZATION")
-    token = token.split(" ")[1]
-    jwt = FuJwt(SECRET_KEY)
-    value = jwt.decode(SECRET_KEY, token)
-    user_info = value.payload
+    user_info = get_request_jwt(request).payload
     return user_info
 
 
-def get_dept(dept_id: int, dept_all_list=None, dept_list=None):
+class DeptIndex:
+    """
+    部门树的邻接索引，按需计算并缓存每个部门的“本部门及以下”部门id
+    """
+
+    def __init__(self, rows):
+        self.children = {}
+        for dept_id, parent_id in rows:
+            self.children.setdefault(parent_id, []).append(dept_id)
+        self.descendants = {}
+
+    def get_descendants(self, dept_id):
+        result = self.descendants.get(dept_id)
+        if result is None:
+            seen = {dept_id}
+            stack = [dept_id]
+            while stack:
+                for child in self.children.get(stack.pop(), ()):
+                    # 防止脏数据形成环导致死循环
+                    if child not in seen:
+                        seen.add(child)
+                        stack.append(child)
+            result = tuple(seen)
+            self.descendants[dept_id] = result
+        return result
+
+
+# 部门保存、删除时由 system.signals 失效
+dept_cache = LocalVersionCache('dept', maxsize=1)
+
+
+def get_dept_index():
+    return dept_cache.get_or_set('index', lambda: DeptIndex(Dept.objects.values_list('id', 'parent_id')))
+
+
+def get_dept(dept_id: int):
     """
-    递归获取部门的所有下级部门
+    获取部门及其所有下级部门
     :param dept_id: 需要获取的部门id
-    :param dept_all_list: 所有部门列表
-    :param dept_list: 递归部门list
-    :return:
+    :return: 部门id列表(包含自身)
     """
-    if not dept_all_list:
-        dept_all_list = Dept.objects.all().values('id', 'parent')
-    if dept_list is None:
-        dept_list = [dept_id]
-    for ele in dept_all_list:
-        if ele.get('parent') == dept_id:
-            dept_list.append(ele.get('id'))
-            get_dept(ele.get('id'), dept_all_list, dept_list)
-    return list(set(dept_list))
+    return list(get_dept_index().get_descendants(dept_id))
 
 
 def insert_content_after_line(filename, target_line, content_to_insert):
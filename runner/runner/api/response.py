@@ -1,11 +1,59 @@
+import hashlib
+
 from pydantic import BaseModel, Field, ValidationError
 from typing import Callable, TypeVar, Optional, Generic
 from functools import wraps
 from ninja import NinjaAPI
+from django.conf import settings
+from django.core.cache import cache
 from django.http import JsonResponse
 T = TypeVar('T')
 
 
+def _count_version_key(model):
+    return f'runner:count:{model._meta.label_lower}:version'
+
+
+def invalidate_count(sender, **kwargs):
+    """模型保存、删除后使该模型的分页总数缓存失效，缓存服务不可用时忽略"""
+    version_key = _count_version_key(sender)
+    try:
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            cache.set(version_key, 1, timeout=None)
+    except Exception:
+        pass
+
+
+def cached_count(queryset):
+    """按模型和查询条件缓存总数 COUNT_CACHE_TIMEOUT 秒，模型有写入时失效，缓存服务不可用时直接 count"""
+    if not hasattr(queryset, 'query'):
+        return len(queryset)
+    queryset = queryset.order_by()
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except Exception:
+        return queryset.count()
+    version_key = _count_version_key(queryset.model)
+    key = 'runner:count:{}:{}'.format(
+        queryset.model._meta.label_lower, hashlib.md5(f'{sql}:{params!r}'.encode()).hexdigest())
+    try:
+        values = cache.get_many([version_key, key])
+    except Exception:
+        return queryset.count()
+    version = values.get(version_key, 0)
+    item = values.get(key)
+    if item is not None and item[0] == version:
+        return item[1]
+    total = queryset.count()
+    try:
+        cache.set(key, (version, total), timeout=getattr(settings, 'COUNT_CACHE_TIMEOUT', 10))
+    except Exception:
+        pass
+    return total
+
+
 class BaseResponse(BaseModel, Generic[T]):
     code: int = Field(2000, description="状态码")
     message: str = Field("success", description="消息描述")
@@ -38,7 +86,7 @@ class PaginatedResponse(BaseResponse):
         page_size: int = 10,
         message: str = "查询成功"
     ):
-        total = queryset.count()
+        total = cached_count(queryset)
         items = queryset[(page-1)*page_size:page*page_size]
         return cls(
             code=2000,
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class RunnerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'runner'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from runner.api.response import invalidate_count
+
+        for model in self.get_models():
+            post_save.connect(invalidate_count, sender=model, dispatch_uid=f'count_save_{model._meta.label_lower}')
+            post_delete.connect(invalidate_count, sender=model, dispatch_uid=f'count_delete_{model._meta.label_lower}')